@@ -1,3 +1,63 @@
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from cart.models import Item, Order
+from movies.models import Movie
+from movies.pagination import encode_cursor
+
+
+class OrdersPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', password='password')
+        cls.movies = [
+            Movie.objects.create(name=f'Movie {i}', price=10 + i, description='', image='movie_images/test.jpg')
+            for i in range(3)
+        ]
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, total=0)
+            Item.objects.bulk_create(
+                Item(order=order, movie=movie, price=movie.price, quantity=1) for movie in self.movies
+            )
+
+    def count_queries(self, **params):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('accounts.orders'), params)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_query_count_is_constant_in_number_of_orders(self):
+        self.create_orders(1)
+        few_queries, _ = self.count_queries()
+        self.create_orders(300)
+        many_queries, response = self.count_queries(per_page=100)
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(len(response.context['template_data']['orders']), 100)
+
+    def test_pages_through_orders_newest_first(self):
+        self.create_orders(25)
+        expected = list(self.user.order_set.order_by('-date', '-id').values_list('id', flat=True))
+        seen = []
+        query = {}
+        while True:
+            _, response = self.count_queries(**query)
+            page = response.context['template_data']['page']
+            seen.extend(order.id for order in page)
+            if not page.has_next:
+                break
+            query = {'after': page.next_cursor}
+        self.assertEqual(seen, expected)
+
+    def test_forged_cursors_return_the_first_page(self):
+        self.create_orders(3)
+        _, response = self.count_queries(per_page=2)
+        first = [order.id for order in response.context['template_data']['page']]
+        for values in ([None, None], [{'x': 1}, 1], [[2024], 1], ['2024-05-01T00:00:00+00:00', {'id': 1}]):
+            _, response = self.count_queries(per_page=2, after=encode_cursor(values))
+            self.assertEqual([order.id for order in response.context['template_data']['page']], first)
@@ -1,7 +1,11 @@
+from django.conf import settings
+from django.db.models import Prefetch
 from django.shortcuts import render
 from django.contrib.auth import login as auth_login, authenticate, logout as auth_logout
 from .forms import CustomUserCreationForm, CustomErrorList, ProfileForm
 from .models import UserProfile
+from cart.models import Item
+from movies.pagination import paginate_request
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 
@@ -68,5 +72,10 @@ def profile(request):
 def orders(request):
     template_data = {}
     template_data['title'] = 'Orders'
-    template_data['orders'] = request.user.order_set.all()
+    orders = request.user.order_set.prefetch_related(
+        Prefetch('item_set', queryset=Item.objects.select_related('movie').order_by('id'))
+    )
+    page = paginate_request(request, orders, ['-date', '-id'], settings.ORDERS_PAGE_SIZE)
+    template_data['orders'] = page.object_list
+    template_data['page'] = page
     return render(request, 'accounts/orders.html', {'template_data': template_data})
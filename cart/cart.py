@@ -0,0 +1,84 @@
+class Cart:
+    """Shopping cart stored in the session as ``{'v': 2, 'i': [[id, qty], ...]}``.
+
+    Quantities are validated integers keyed by integer movie ids. Older
+    sessions that hold the original ``{"<id>": "<qty>"}`` dict are read
+    transparently and rewritten in the current format. The session is only
+    written by ``save()`` when the cart actually changed, so viewing a cart
+    does not cost a session write.
+    """
+
+    SESSION_KEY = 'cart'
+    VERSION = 2
+    MAX_QUANTITY = 10
+
+    def __init__(self, session):
+        self.session = session
+        self.dirty = False
+        self._items = self._load(session.get(self.SESSION_KEY))
+
+    def _load(self, data):
+        if not data:
+            return {}
+        if isinstance(data, dict) and data.get('v') == self.VERSION:
+            pairs = data.get('i', [])
+        elif isinstance(data, dict) and 'v' not in data:
+            # Version 1: {"<movie id>": "<quantity>"} straight from the form.
+            pairs = data.items()
+            self.dirty = True
+        else:
+            self.dirty = True
+            return {}
+        items = {}
+        for movie_id, quantity in pairs:
+            try:
+                items[int(movie_id)] = self.clean_quantity(quantity)
+            except (TypeError, ValueError):
+                self.dirty = True
+        return items
+
+    @classmethod
+    def clean_quantity(cls, quantity):
+        quantity = int(quantity)
+        if quantity < 1 or quantity > cls.MAX_QUANTITY:
+            raise ValueError(f'Quantity must be between 1 and {cls.MAX_QUANTITY}.')
+        return quantity
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __contains__(self, movie_id):
+        return movie_id in self._items
+
+    def __iter__(self):
+        return iter(self._items.items())
+
+    @property
+    def movie_ids(self):
+        return list(self._items)
+
+    def quantity(self, movie_id):
+        return self._items.get(movie_id, 0)
+
+    def add(self, movie_id, quantity):
+        """Set the quantity for ``movie_id``; raises ValueError if it is invalid."""
+        quantity = self.clean_quantity(quantity)
+        if self._items.get(movie_id) != quantity:
+            self._items[movie_id] = quantity
+            self.dirty = True
+
+    def clear(self):
+        if self._items:
+            self._items = {}
+            self.dirty = True
+
+    def serialize(self):
+        return {'v': self.VERSION, 'i': [[movie_id, quantity] for movie_id, quantity in self._items.items()]}
+
+    def save(self):
+        if self.dirty:
+            self.session[self.SESSION_KEY] = self.serialize()
+            self.dirty = False
@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-18 09:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_order_region'),
+        ('movies', '0012_movie_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-date', '-id'], name='order_user_date_idx'),
+        ),
+    ]
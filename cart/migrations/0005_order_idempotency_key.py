@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-18 09:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_order_user_date_idx'),
+        ('movies', '0013_review_movie_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='unique_order_idempotency_key'),
+        ),
+    ]
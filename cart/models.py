@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from movies.models import Movie, Region
+from .utils import movie_record_cache
 
 class Order(models.Model):
     id = models.AutoField(primary_key=True)
@@ -8,6 +11,15 @@ class Order(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     region = models.ForeignKey(Region, on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_order_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='order_user_date_idx'),
+        ]
     
     def __str__(self):
         return str(self.id) + ' - ' + self.user.username
@@ -21,3 +33,9 @@ class Item(models.Model):
     
     def __str__(self):
         return str(self.id) + ' - ' + self.movie.name
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def invalidate_cart_movie(sender, instance, **kwargs):
+    movie_record_cache.invalidate(instance.id)
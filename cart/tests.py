@@ -1,3 +1,218 @@
-from django.test import TestCase
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from movies.models import Movie, RegionMovieSales
+from .cart import Cart
+from .models import Item, Order
+from .utils import movie_record_cache
+
+
+class PurchaseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', password='password')
+        cls.movies = [
+            Movie.objects.create(name=f'Movie {i}', price=10 + i, description='', image='movie_images/test.jpg')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['cart'] = {str(movie.id): '2' for movie in self.movies}
+        session.save()
+
+    def test_creates_order_items_and_sales_at_current_prices(self):
+        Movie.objects.filter(id=self.movies[0].id).update(price=99)
+        response = self.client.post(reverse('cart.purchase'), {'idempotency_key': 'key-1'})
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get()
+        self.assertEqual(order.total, (99 + 11 + 12) * 2)
+        self.assertEqual(
+            sorted(Item.objects.values_list('price', 'quantity')),
+            [(11, 2), (12, 2), (99, 2)],
+        )
+        self.assertEqual(RegionMovieSales.objects.get(movie=self.movies[0]).revenue, 198)
+
+    def test_failure_midway_leaves_no_partial_order(self):
+        with mock.patch('cart.views.record_region_sales', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('cart.purchase'), {'idempotency_key': 'key-1'})
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Item.objects.exists())
+        self.assertEqual(len(self.client.session['cart']), 3)
+
+    def test_get_does_not_place_an_order(self):
+        response = self.client.get(reverse('cart.purchase'))
+        self.assertRedirects(response, reverse('cart.index'))
+        self.assertFalse(Order.objects.exists())
+
+    def test_replayed_submission_returns_original_order(self):
+        first = self.client.post(reverse('cart.purchase'), {'idempotency_key': 'key-1'})
+        session = self.client.session
+        session['cart'] = {str(self.movies[0].id): '1'}
+        session.save()
+        with self.assertNumQueries(3):
+            second = self.client.post(reverse('cart.purchase'), {'idempotency_key': 'key-1'})
+        order = Order.objects.get()
+        self.assertEqual(first.context['template_data']['order_id'], order.id)
+        self.assertEqual(second.context['template_data']['order_id'], order.id)
+        self.assertEqual(Item.objects.count(), 3)
+
+    def test_key_inserted_concurrently_returns_that_order(self):
+        existing = Order.objects.create(user=self.user, total=1, idempotency_key='key-1')
+        missing = Order.objects.none()
+        with mock.patch.object(Order.objects, 'filter', side_effect=[missing, Order.objects.filter(id=existing.id)]):
+            response = self.client.post(reverse('cart.purchase'), {'idempotency_key': 'key-1'})
+        self.assertEqual(response.context['template_data']['order_id'], existing.id)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse(Item.objects.exists())
+
+    def test_distinct_keys_place_distinct_orders(self):
+        self.client.post(reverse('cart.purchase'), {'idempotency_key': 'key-1'})
+        session = self.client.session
+        session['cart'] = {str(self.movies[0].id): '1'}
+        session.save()
+        self.client.post(reverse('cart.purchase'), {'idempotency_key': 'key-2'})
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class CartTests(TestCase):
+    def test_reads_legacy_session_format_and_rewrites_it(self):
+        session = {'cart': {'3': '2', '5': 'x', '7': '1'}}
+        cart = Cart(session)
+        self.assertEqual(dict(cart), {3: 2, 7: 1})
+        self.assertTrue(cart.dirty)
+        cart.save()
+        self.assertEqual(session['cart'], {'v': 2, 'i': [[3, 2], [7, 1]]})
+
+    def test_only_writes_session_when_changed(self):
+        session = mock.MagicMock()
+        session.get.return_value = {'v': 2, 'i': [[3, 2]]}
+        cart = Cart(session)
+        cart.add(3, '2')
+        cart.save()
+        session.__setitem__.assert_not_called()
+        cart.add(3, '4')
+        cart.save()
+        session.__setitem__.assert_called_once_with('cart', {'v': 2, 'i': [[3, 4]]})
+
+    def test_rejects_invalid_quantities(self):
+        cart = Cart({})
+        for quantity in [None, 'abc', '0', '11']:
+            with self.assertRaises((TypeError, ValueError)):
+                cart.add(1, quantity)
+        self.assertEqual(len(cart), 0)
+
+    def test_add_view_ignores_invalid_quantity(self):
+        movie = Movie.objects.create(name='Movie', price=10, description='', image='movie_images/test.jpg')
+        self.client.post(reverse('cart.add', args=[movie.id]), {'quantity': '-1'})
+        self.assertNotIn('cart', self.client.session)
+        self.client.post(reverse('cart.add', args=[movie.id]), {'quantity': '3'})
+        self.assertEqual(self.client.session['cart'], {'v': 2, 'i': [[movie.id, 3]]})
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions-test'},
+})
+class CartSessionEngineTests(TestCase):
+    def test_cart_round_trips_through_every_session_mode(self):
+        movie = Movie.objects.create(name='Movie', price=10, description='', image='movie_images/test.jpg')
+        for mode, engine in settings.SESSION_ENGINES.items():
+            with self.subTest(mode=mode), self.settings(SESSION_ENGINE=engine):
+                client = Client()
+                client.post(reverse('cart.add', args=[movie.id]), {'quantity': '2'})
+                template_data = client.get(reverse('cart.index')).context['template_data']
+                self.assertEqual(template_data['cart_total'], 20)
+
+
+class CartMovieCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movies = [
+            Movie.objects.create(name=f'Movie {i}', price=10 + i, description='', image='movie_images/test.jpg')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        movie_record_cache.clear()
+        session = self.client.session
+        session['cart'] = {str(movie.id): '2' for movie in self.movies}
+        session.save()
+
+    def view_cart(self):
+        return self.client.get(reverse('cart.index')).context['template_data']
+
+    def test_repeat_views_are_served_from_memory(self):
+        self.view_cart()
+        with CaptureQueriesContext(connection) as queries:
+            template_data = self.view_cart()
+        self.assertEqual(template_data['cart_total'], (10 + 11 + 12) * 2)
+        # Only the session read remains: no movie lookup and no session write.
+        self.assertEqual(len(queries.captured_queries), 1)
+
+    def test_movie_save_invalidates_cached_record(self):
+        self.view_cart()
+        movie = self.movies[0]
+        movie.price = 50
+        movie.save()
+        self.assertEqual(self.view_cart()['cart_total'], (50 + 11 + 12) * 2)
+
+    def test_least_recently_used_records_are_evicted(self):
+        cache = type(movie_record_cache)(maxsize=2, ttl=60)
+        cache.get_many([self.movies[0].id, self.movies[1].id])
+        cache.get_many([self.movies[0].id])
+        cache.get_many([self.movies[2].id])
+        with self.assertNumQueries(0):
+            cache.get_many([self.movies[0].id, self.movies[2].id])
+        with self.assertNumQueries(1):
+            cache.get_many([self.movies[1].id])
+
+
+class ConcurrentPurchaseTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='password')
+        self.movie = Movie.objects.create(name='Movie', price=10, description='', image='movie_images/test.jpg')
+
+    def test_parallel_identical_submissions_create_one_order(self):
+        clients = []
+        for _ in range(8):
+            client = Client()
+            client.force_login(self.user)
+            session = client.session
+            session['cart'] = {str(self.movie.id): '1'}
+            session.save()
+            clients.append(client)
+
+        barrier = threading.Barrier(len(clients))
+        order_ids = []
+        errors = []
+
+        def submit(client):
+            try:
+                barrier.wait()
+                response = client.post(reverse('cart.purchase'), {'idempotency_key': 'same-key'})
+                order_ids.append(response.context['template_data']['order_id'])
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(set(order_ids), {Order.objects.get().id})
+        self.assertEqual(Item.objects.count(), 1)
@@ -1,6 +1,67 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from movies.models import Movie
+
+CartMovie = namedtuple('CartMovie', ['id', 'name', 'price', 'image'])
+
+
 def calculate_cart_total(cart, movies_in_cart):
     total = 0
     for movie in movies_in_cart:
-        quantity = cart[str(movie.id)]
-        total += movie.price * int(quantity)
-    return total
\ No newline at end of file
+        total += movie.price * cart.quantity(movie.id)
+    return total
+
+
+class MovieRecordCache:
+    """Per-process LRU of the movie fields the cart needs.
+
+    Entries expire after ``ttl`` seconds and are dropped on Movie save/delete
+    in this process; the TTL bounds how stale other processes can be.
+    Checkout still reads prices from the database under a lock.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get_many(self, movie_ids):
+        """Return CartMovie records for ``movie_ids`` ordered by id."""
+        movie_ids = {int(movie_id) for movie_id in movie_ids}
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for movie_id in movie_ids:
+                entry = self._entries.get(movie_id)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(movie_id)
+                    found[movie_id] = entry[1]
+
+        missing = movie_ids - found.keys()
+        if missing:
+            rows = Movie.objects.filter(id__in=missing).values_list('id', 'name', 'price', 'image')
+            fetched = {row[0]: CartMovie(*row) for row in rows}
+            found.update(fetched)
+            with self._lock:
+                for movie_id, record in fetched.items():
+                    self._entries[movie_id] = (now + self.ttl, record)
+                    self._entries.move_to_end(movie_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return [found[movie_id] for movie_id in sorted(found)]
+
+    def invalidate(self, movie_id):
+        with self._lock:
+            self._entries.pop(movie_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+movie_record_cache = MovieRecordCache(settings.CART_MOVIE_CACHE_SIZE, settings.CART_MOVIE_CACHE_TTL)
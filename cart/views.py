@@ -1,66 +1,123 @@
+import uuid
+
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404, redirect
 from movies.models import Movie
-from .utils import calculate_cart_total
+from movies.utils import record_region_sales
+from moviesstore.routers import pin_to_primary
+from .cart import Cart
+from .utils import calculate_cart_total, movie_record_cache
 from .models import Order, Item
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
 
 def index(request):
     cart_total = 0
     movies_in_cart = []
-    cart = request.session.get('cart', {})
-    movie_ids = list(cart.keys())
-    if (movie_ids != []):
-        movies_in_cart = Movie.objects.filter(id__in=movie_ids)
+    cart = Cart(request.session)
+    if cart:
+        movies_in_cart = movie_record_cache.get_many(cart.movie_ids)
         cart_total = calculate_cart_total(cart, movies_in_cart)
+    cart.save()
     template_data = {}
     template_data['title'] = 'Cart'
+    template_data['cart'] = cart
     template_data['movies_in_cart'] = movies_in_cart
     template_data['cart_total'] = cart_total
+    template_data['idempotency_key'] = uuid.uuid4().hex
     return render(request, 'cart/index.html',
         {'template_data': template_data})
 
 def add(request, id):
     get_object_or_404(Movie, id=id)
-    cart = request.session.get('cart', {})
-    cart[id] = request.POST['quantity']
-    request.session['cart'] = cart
+    cart = Cart(request.session)
+    try:
+        cart.add(id, request.POST.get('quantity'))
+    except (TypeError, ValueError):
+        return redirect('movies.show', id=id)
+    cart.save()
     return redirect('home.index')
 
 def add_to_cart(request, id):
     get_object_or_404(Movie, id=id)
-    cart = request.session.get('cart', {})
-    cart[id] = request.POST['quantity']
-    request.session['cart'] = cart
+    cart = Cart(request.session)
+    try:
+        cart.add(id, request.POST.get('quantity'))
+    except (TypeError, ValueError):
+        return redirect('movies.show', id=id)
+    cart.save()
     return redirect('cart.index')
 
 def clear(request):
-    request.session['cart'] = {}
+    cart = Cart(request.session)
+    cart.clear()
+    cart.save()
     return redirect('cart.index')
 
 @login_required
 def purchase(request):
-    cart = request.session.get('cart', {})
-    movie_ids = list(cart.keys())
+    if request.method != 'POST':
+        return redirect('cart.index')
+    # The cart page issues a fresh key per checkout form; a replayed or
+    # double-submitted form carries the same key and gets the original order.
+    idempotency_key = request.POST.get('idempotency_key', '')[:64] or None
+    if idempotency_key:
+        order = Order.objects.filter(user=request.user, idempotency_key=idempotency_key).first()
+        if order:
+            return purchase_confirmation(request, order)
+
+    cart = Cart(request.session)
+    movie_ids = cart.movie_ids
     if (movie_ids == []):
         return redirect('cart.index')
-    movies_in_cart = Movie.objects.filter(id__in=movie_ids)
-    cart_total = calculate_cart_total(cart, movies_in_cart)
-    order = Order()
-    order.user = request.user
-    order.total = cart_total
+    region = None
     profile = getattr(request.user, 'profile', None)
     if profile and profile.region:
-        order.region = profile.region
-    order.save()
-    for movie in movies_in_cart:
-        item = Item()
-        item.movie = movie
-        item.price = movie.price
-        item.order = order
-        item.quantity = cart[str(movie.id)]
-        item.save()
-    request.session['cart'] = {}
+        region = profile.region
+    try:
+        with transaction.atomic():
+            # Insert the order first: it claims the idempotency key and takes
+            # the write lock up front, so a concurrent duplicate waits here and
+            # then fails on the unique constraint instead of racing the checks.
+            order = Order()
+            order.user = request.user
+            order.total = 0
+            order.idempotency_key = idempotency_key
+            order.region = region
+            order.save()
+            # Lock the cart's movies so the prices charged are the ones read here.
+            movies_in_cart = list(
+                Movie.objects.select_for_update()
+                .filter(id__in=movie_ids)
+                .only('id', 'name', 'price')
+                .order_by('id')
+            )
+            order.total = calculate_cart_total(cart, movies_in_cart)
+            order.save(update_fields=['total'])
+            items = []
+            for movie in movies_in_cart:
+                item = Item()
+                item.movie = movie
+                item.price = movie.price
+                item.order = order
+                item.quantity = cart.quantity(movie.id)
+                items.append(item)
+            Item.objects.bulk_create(items)
+            record_region_sales(order.region, items)
+    except IntegrityError:
+        # A concurrent submission with the same key committed first.
+        if idempotency_key is None:
+            raise
+        order = Order.objects.filter(user=request.user, idempotency_key=idempotency_key).first()
+        if order is None:
+            raise
+        return purchase_confirmation(request, order)
+    cart.clear()
+    cart.save()
+    pin_to_primary(request)
+    return purchase_confirmation(request, order)
+
+def purchase_confirmation(request, order):
     template_data = {}
     template_data['title'] = 'Purchase confirmation'
     template_data['order_id'] = order.id
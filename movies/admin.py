@@ -1,14 +1,109 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import F
 
-from .models import Movie, Review, Rating, Region, MovieRequest, MovieRequestVote
+from .models import Movie, Review, Rating, Region, MovieRequest, MovieRequestVote, RegionMovieSales
 
-class MovieAdmin(admin.ModelAdmin):
+
+class CounterFieldsAdmin(admin.ModelAdmin):
+    """Admin for models with counters that are maintained with F() updates.
+
+    The counters are shown read-only and an edit saves only the form's
+    fields. A full save would write back the counter values the page was
+    loaded with, undoing any increments made while it was open.
+    """
+
+    counter_fields = []
+
+    def get_readonly_fields(self, request, obj=None):
+        return [*super().get_readonly_fields(request, obj), *self.counter_fields]
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save(update_fields=list(form.fields))
+        else:
+            obj.save()
+
+
+class MovieAdmin(CounterFieldsAdmin):
     ordering = ['name']
     search_fields = ['name']
+    counter_fields = ['rating_sum', 'rating_count', 'cache_version']
+
+
+class MovieRequestAdmin(CounterFieldsAdmin):
+    counter_fields = ['vote_count']
+
+
+class MovieRequestVoteAdmin(admin.ModelAdmin):
+    """Read-only: votes are toggled through request_vote, which keeps vote_count in step."""
+
+    list_display = ['request', 'user']
+    list_select_related = ['request', 'user']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class RatingAdmin(admin.ModelAdmin):
+    """Ratings can be viewed and deleted, but not added or edited.
+
+    rate_movie keeps Movie.rating_sum/rating_count in step with the Rating
+    rows, so deletions here subtract from those totals the same way.
+    """
+
+    list_display = ['movie', 'user', 'value', 'updated_at']
+    list_select_related = ['movie', 'user']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Rating.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            removed = {}
+            for rating in queryset.select_related(None).select_for_update().only('id', 'movie_id', 'value'):
+                total, count = removed.get(rating.movie_id, (0, 0))
+                removed[rating.movie_id] = (total + rating.value, count + 1)
+                rating.delete()
+            for movie_id, (total, count) in removed.items():
+                Movie.objects.filter(id=movie_id).update(
+                    rating_sum=F('rating_sum') - total,
+                    rating_count=F('rating_count') - count,
+                )
+
+
+class RegionMovieSalesAdmin(admin.ModelAdmin):
+    """Read-only: the rollup is maintained by order signals and rebuild_region_sales."""
+
+    list_display = ['region', 'movie', 'total_quantity', 'revenue']
+    list_select_related = ['region', 'movie']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
-admin.site.register(Movie)
+admin.site.register(Movie, MovieAdmin)
 admin.site.register(Review)
-admin.site.register(Rating)
+admin.site.register(Rating, RatingAdmin)
 admin.site.register(Region)
-admin.site.register(MovieRequest)
-admin.site.register(MovieRequestVote)
+admin.site.register(MovieRequest, MovieRequestAdmin)
+admin.site.register(MovieRequestVote, MovieRequestVoteAdmin)
+admin.site.register(RegionMovieSales, RegionMovieSalesAdmin)
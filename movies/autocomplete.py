@@ -0,0 +1,66 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+
+class MovieNameIndex:
+    """In-process sorted prefix index of movie names.
+
+    Every word start of every name gets an entry, so "wars" finds
+    "Star Wars" as well as "Wars of the Worlds". Lookups are a bisect on a
+    sorted list of casefolded keys and never touch the database. The index is
+    loaded on first use and dropped on Movie save/delete; other processes pick
+    the change up once their copy is older than AUTOCOMPLETE_MAX_AGE seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None
+        self._entries = None
+        self._loaded_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._entries = None
+
+    def _load(self):
+        from .models import Movie
+
+        entries = []
+        for movie_id, name in Movie.objects.values_list('id', 'name').iterator():
+            folded = name.casefold()
+            words = folded.split()
+            for position in range(len(words)):
+                entries.append((' '.join(words[position:]), position, name, movie_id))
+        entries.sort()
+        return [entry[0] for entry in entries], entries
+
+    def _snapshot(self):
+        with self._lock:
+            expired = time.monotonic() - self._loaded_at > settings.AUTOCOMPLETE_MAX_AGE
+            if self._keys is None or expired:
+                self._keys, self._entries = self._load()
+                self._loaded_at = time.monotonic()
+            return self._keys, self._entries
+
+    def suggest(self, prefix, limit=10):
+        prefix = ' '.join(prefix.casefold().split())
+        if not prefix:
+            return []
+        keys, entries = self._snapshot()
+        results = []
+        seen = set()
+        index = bisect_left(keys, prefix)
+        while index < len(keys) and keys[index].startswith(prefix) and len(results) < limit:
+            _, _, name, movie_id = entries[index]
+            if movie_id not in seen:
+                seen.add(movie_id)
+                results.append({'id': movie_id, 'name': name})
+            index += 1
+        return results
+
+
+movie_name_index = MovieNameIndex()
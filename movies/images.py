@@ -0,0 +1,92 @@
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+THUMBNAIL_DIR = 'thumbs'
+
+
+def fallback_format(name):
+    """Derivatives keep PNG for PNG originals (transparency) and are JPEG otherwise."""
+    return 'png' if name.lower().endswith('.png') else 'jpg'
+
+
+def derivative_name(name, width, extension):
+    """``movie_images/poster.jpg`` -> ``movie_images/thumbs/poster-320w.webp``."""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, THUMBNAIL_DIR, f'{stem}-{width}w.{extension}')
+
+
+def _encode(image, extension):
+    output = io.BytesIO()
+    if extension == 'webp':
+        image.save(output, 'WEBP', quality=settings.MOVIE_THUMBNAIL_QUALITY, method=6)
+    elif extension == 'png':
+        image.save(output, 'PNG', optimize=True)
+    else:
+        image.convert('RGB').save(output, 'JPEG', quality=settings.MOVIE_THUMBNAIL_QUALITY, optimize=True, progressive=True)
+    return ContentFile(output.getvalue())
+
+
+def _oriented_width(image):
+    """Width after EXIF rotation, read from the header without decoding pixels."""
+    orientation = image.getexif().get(ExifTags.Base.Orientation)
+    return image.height if orientation in (5, 6, 7, 8) else image.width
+
+
+def generate_thumbnails(name, storage=default_storage, force=False):
+    """Write the resized JPEG/PNG and WebP variants of one uploaded image.
+
+    One variant per MOVIE_THUMBNAIL_WIDTHS entry narrower than the original,
+    stored next to it under ``thumbs/``. Existing variants are kept unless
+    ``force``; when they all exist only the original's header is read, so
+    saving a movie does not decode its image again. Returns the names
+    written; a missing or unreadable original writes nothing.
+    """
+    if not name:
+        return []
+    try:
+        with storage.open(name) as original:
+            image = Image.open(original)
+            original_width = _oriented_width(image)
+            targets = {
+                width: [
+                    (extension, derivative_name(name, width, extension))
+                    for extension in ('webp', fallback_format(name))
+                    if force or not storage.exists(derivative_name(name, width, extension))
+                ]
+                for width in settings.MOVIE_THUMBNAIL_WIDTHS
+                if width < original_width
+            }
+            if not any(targets.values()):
+                return []
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (FileNotFoundError, UnidentifiedImageError, OSError):
+        return []
+
+    written = []
+    for width, missing in targets.items():
+        if not missing:
+            continue
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS)
+        for extension, target in missing:
+            if force and storage.exists(target):
+                storage.delete(target)
+            written.append(storage.save(target, _encode(resized, extension)))
+    return written
+
+
+def thumbnail_srcset(name, extension, storage=default_storage):
+    """Build a ``srcset`` value from the variants of ``name`` that exist."""
+    candidates = []
+    for width in settings.MOVIE_THUMBNAIL_WIDTHS:
+        target = derivative_name(name, width, extension)
+        if storage.exists(target):
+            candidates.append(f'{storage.url(target)} {width}w')
+    return ', '.join(candidates)
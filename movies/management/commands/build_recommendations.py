@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from movies.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute the "also liked" neighbor table from ratings and purchases.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=settings.RECOMMENDATIONS_TOP_K,
+            help='Number of neighbors to keep per movie.',
+        )
+
+    def handle(self, *args, **options):
+        count = build_recommendations(top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} movie neighbor(s).'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from moviesstore.exports import DATASETS, FORMATS, export_rows, parse_bound
+
+
+class Command(BaseCommand):
+    help = 'Stream orders, items, ratings or reviews as CSV or JSON Lines without loading the table into memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--start', help='Only rows on or after this date (YYYY-MM-DD or ISO 8601 datetime).')
+        parser.add_argument('--end', help='Only rows before this datetime, or on or before this date.')
+        parser.add_argument('--output', help='File to write to; defaults to standard output.')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows fetched per database round trip.')
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_bound(options['start'])
+            end = parse_bound(options['end'], end=True)
+        except ValueError as error:
+            raise CommandError(error)
+
+        chunks = export_rows(options['dataset'], options['format'], start, end, options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            self.stdout.write(self.style.SUCCESS(f"Exported {options['dataset']} to {options['output']}."))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from movies.images import generate_thumbnails
+from movies.models import Movie, bump_movie_cache_version
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized and WebP variants of every movie image.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate variants that already exist.',
+        )
+
+    def handle(self, *args, **options):
+        written = 0
+        for movie in Movie.objects.only('id', 'image').iterator():
+            names = generate_thumbnails(movie.image.name, force=options['force'])
+            if names:
+                # Cached fragments rendered before the variants existed have no srcset.
+                bump_movie_cache_version(movie.id)
+                written += len(names)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} thumbnail(s).'))
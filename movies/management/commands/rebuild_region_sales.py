@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from movies.utils import rebuild_region_sales
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-region movie sales rollup, trending scores and hourly sales buckets from the full order history.'
+
+    def handle(self, *args, **options):
+        count = rebuild_region_sales()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} region sales rows.'))
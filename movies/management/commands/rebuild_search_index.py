@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from movies.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the movie search index from the Movie table.'
+
+    def handle(self, *args, **options):
+        get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the movie search index.'))
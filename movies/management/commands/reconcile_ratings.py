@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from movies.utils import reconcile_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored rating totals on every movie and report any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted movies without correcting them.',
+        )
+
+    def handle(self, *args, **options):
+        drifted = reconcile_rating_aggregates(fix=not options['dry_run'])
+        for movie, actual_sum, actual_count in drifted:
+            self.stdout.write(
+                f'{movie}: stored {movie.rating_sum}/{movie.rating_count}, '
+                f'actual {actual_sum}/{actual_count}'
+            )
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Rating aggregates are in sync.'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(drifted)} movie(s) drifted.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Corrected {len(drifted)} movie(s).'))
@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-18 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_region_seed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionMovieSales',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('total_quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.PositiveIntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='region_sales', to='movies.movie')),
+                ('region', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movie_sales', to='movies.region')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['region', '-total_quantity'], name='region_sales_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='regionmoviesales',
+            constraint=models.UniqueConstraint(fields=('region', 'movie'), name='unique_region_movie_sales'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import F, Sum
+
+
+def backfill_region_sales(apps, schema_editor):
+    Item = apps.get_model('cart', 'Item')
+    RegionMovieSales = apps.get_model('movies', 'RegionMovieSales')
+    rows = (
+        Item.objects.values('order__region_id', 'movie_id')
+        .annotate(total_quantity=Sum('quantity'), revenue=Sum(F('price') * F('quantity')))
+        .order_by()
+    )
+    RegionMovieSales.objects.bulk_create(
+        [
+            RegionMovieSales(
+                region_id=row['order__region_id'],
+                movie_id=row['movie_id'],
+                total_quantity=row['total_quantity'],
+                revenue=row['revenue'],
+            )
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+def clear_region_sales(apps, schema_editor):
+    RegionMovieSales = apps.get_model('movies', 'RegionMovieSales')
+    RegionMovieSales.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_regionmoviesales'),
+        ('cart', '0003_order_region'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_region_sales, clear_region_sales),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-18 09:18
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    movies = Movie.objects.annotate(total=Sum('ratings__value'), total_count=Count('ratings')).filter(total_count__gt=0)
+    updates = []
+    for movie in movies:
+        movie.rating_sum = movie.total
+        movie.rating_count = movie.total_count
+        updates.append(movie)
+    Movie.objects.bulk_update(updates, ['rating_sum', 'rating_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_regionmoviesales_backfill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
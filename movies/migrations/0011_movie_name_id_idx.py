@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_movie_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['name', 'id'], name='movie_name_id_idx'),
+        ),
+    ]
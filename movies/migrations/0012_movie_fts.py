@@ -0,0 +1,49 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS movies_movie_fts "
+        "USING fts5(name, description, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO movies_movie_fts (rowid, name, description) "
+        "SELECT id, name, description FROM movies_movie"
+    )
+    # Rank name matches ten times higher than description matches.
+    schema_editor.execute(
+        "INSERT INTO movies_movie_fts (movies_movie_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS movies_movie_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0011_movie_name_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.CreateModel(
+            name='MovieSearchIndex',
+            fields=[
+                ('movie', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='movies.movie')),
+                ('name', models.TextField()),
+                ('description', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'movies_movie_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 09:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_movie_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', '-date', '-id'], name='review_movie_date_idx'),
+        ),
+    ]
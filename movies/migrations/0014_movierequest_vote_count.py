@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-18 09:41
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_vote_counts(apps, schema_editor):
+    MovieRequest = apps.get_model('movies', 'MovieRequest')
+    requests = MovieRequest.objects.annotate(total_votes=Count('votes')).filter(total_votes__gt=0)
+    updates = []
+    for movie_request in requests:
+        movie_request.vote_count = movie_request.total_votes
+        updates.append(movie_request)
+    MovieRequest.objects.bulk_update(updates, ['vote_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0013_review_movie_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movierequest',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_vote_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='movierequest',
+            index=models.Index(fields=['-vote_count', '-id'], name='request_vote_rank_idx'),
+        ),
+    ]
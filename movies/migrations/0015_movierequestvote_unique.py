@@ -0,0 +1,45 @@
+# Generated by Django 5.0 on 2026-10-18 09:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    MovieRequest = apps.get_model('movies', 'MovieRequest')
+    MovieRequestVote = apps.get_model('movies', 'MovieRequestVote')
+    duplicates = (
+        MovieRequestVote.objects.values('request_id', 'user_id')
+        .annotate(first_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    request_ids = set()
+    for duplicate in duplicates:
+        MovieRequestVote.objects.filter(
+            request_id=duplicate['request_id'],
+            user_id=duplicate['user_id'],
+        ).exclude(id=duplicate['first_id']).delete()
+        request_ids.add(duplicate['request_id'])
+
+    updates = []
+    for movie_request in MovieRequest.objects.filter(id__in=request_ids).annotate(total_votes=Count('votes')):
+        movie_request.vote_count = movie_request.total_votes
+        updates.append(movie_request)
+    MovieRequest.objects.bulk_update(updates, ['vote_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0014_movierequest_vote_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='movierequestvote',
+            constraint=models.UniqueConstraint(fields=('request', 'user'), name='unique_request_vote_per_user'),
+        ),
+    ]
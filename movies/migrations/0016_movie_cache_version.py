@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0015_movierequestvote_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-18 09:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0016_movie_cache_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieNeighbor',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='movies.movie')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='movieneighbor',
+            constraint=models.UniqueConstraint(fields=('movie', 'rank'), name='unique_movie_neighbor_rank'),
+        ),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 5.0 on 2026-10-18 10:01
+
+import math
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of movies.trending as of this migration, with the default
+# TRENDING_HALF_LIFE_HOURS. Deployments that use another half-life run
+# rebuild_region_sales afterwards, as for any change of that setting.
+DECAY_RATE = math.log(2) / (72 * 3600)
+
+
+def add_trend(trend_log, weight):
+    if trend_log is None:
+        return weight
+    high, low = max(trend_log, weight), min(trend_log, weight)
+    return high + math.log1p(math.exp(low - high))
+
+
+def backfill_trends(apps, schema_editor):
+    Item = apps.get_model('cart', 'Item')
+    RegionMovieSales = apps.get_model('movies', 'RegionMovieSales')
+    MovieTrend = apps.get_model('movies', 'MovieTrend')
+    MovieSalesBucket = apps.get_model('movies', 'MovieSalesBucket')
+
+    region_trends = {}
+    trends = {}
+    buckets = {}
+    rows = Item.objects.values_list('order__region_id', 'movie_id', 'order__date', 'quantity').order_by()
+    for region_id, movie_id, date, quantity in rows.iterator(chunk_size=2000):
+        if quantity <= 0:
+            continue
+        weight = math.log(quantity) + DECAY_RATE * date.timestamp()
+        region_trends[region_id, movie_id] = add_trend(region_trends.get((region_id, movie_id)), weight)
+        trends[movie_id] = add_trend(trends.get(movie_id), weight)
+        key = (region_id, movie_id, date.replace(minute=0, second=0, microsecond=0))
+        buckets[key] = buckets.get(key, 0) + quantity
+
+    updates = []
+    for row in RegionMovieSales.objects.all():
+        trend_log = region_trends.get((row.region_id, row.movie_id))
+        if trend_log is not None:
+            row.trend_log = trend_log
+            updates.append(row)
+    RegionMovieSales.objects.bulk_update(updates, ['trend_log'], batch_size=500)
+    MovieTrend.objects.bulk_create(
+        [MovieTrend(movie_id=movie_id, trend_log=trend_log) for movie_id, trend_log in trends.items()],
+        batch_size=500,
+    )
+    MovieSalesBucket.objects.bulk_create(
+        [
+            MovieSalesBucket(region_id=region_id, movie_id=movie_id, hour=hour, quantity=quantity)
+            for (region_id, movie_id, hour), quantity in buckets.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0017_movieneighbor'),
+        ('cart', '0003_order_region'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieSalesBucket',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('hour', models.DateTimeField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovieTrend',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='movies.movie')),
+                ('trend_log', models.FloatField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='regionmoviesales',
+            name='trend_log',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='regionmoviesales',
+            index=models.Index(fields=['region', '-trend_log'], name='region_sales_trend_idx'),
+        ),
+        migrations.AddField(
+            model_name='moviesalesbucket',
+            name='movie',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_buckets', to='movies.movie'),
+        ),
+        migrations.AddField(
+            model_name='moviesalesbucket',
+            name='region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_buckets', to='movies.region'),
+        ),
+        migrations.AddIndex(
+            model_name='movietrend',
+            index=models.Index(fields=['-trend_log'], name='movie_trend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moviesalesbucket',
+            index=models.Index(fields=['hour'], name='sales_bucket_hour_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moviesalesbucket',
+            index=models.Index(fields=['region', 'hour'], name='sales_bucket_region_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='moviesalesbucket',
+            constraint=models.UniqueConstraint(fields=('region', 'movie', 'hour'), name='unique_sales_bucket'),
+        ),
+        migrations.RunPython(backfill_trends, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import movie_name_index
+from .images import generate_thumbnails
+from .search import get_search_backend
 
 
 class Region(models.Model):
@@ -21,16 +28,56 @@ class Movie(models.Model):
     price = models.IntegerField()
     description = models.TextField()
     image = models.ImageField(upload_to='movie_images/')
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # Part of the template fragment cache keys for this movie; bumped whenever
+    # the movie, one of its ratings or one of its reviews is saved or deleted.
+    cache_version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='movie_name_id_idx'),
+        ]
     
     def __str__(self):
         return str(self.id) + ' - ' + self.name
+
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
     
+class MovieSearchIndex(models.Model):
+    """Read-only view of the SQLite FTS5 table created in migration 0012."""
+
+    movie = models.OneToOneField(
+        Movie,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_index',
+    )
+    name = models.TextField()
+    description = models.TextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'movies_movie_fts'
+
 class Review(models.Model):
     id = models.AutoField(primary_key=True)
     comment = models.CharField(max_length=255)
     date = models.DateTimeField(auto_now_add=True)
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['movie', '-date', '-id'], name='review_movie_date_idx'),
+        ]
     
     def __str__(self):
         return str(self.id) + ' - ' + self.movie.name
@@ -58,6 +105,12 @@ class MovieRequest(models.Model):
     description = models.TextField()
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    vote_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-vote_count', '-id'], name='request_vote_rank_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} by {self.user.username}"
@@ -68,5 +121,123 @@ class MovieRequestVote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['request', 'user'], name='unique_request_vote_per_user'),
+        ]
+
     def __str__(self):
         return f"{self.name} by {self.user.username}"
+
+class MovieNeighbor(models.Model):
+    """One of a movie's most similar movies, as computed by build_recommendations."""
+
+    id = models.AutoField(primary_key=True)
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'rank'], name='unique_movie_neighbor_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} -> {self.neighbor_id} ({self.score:.3f})"
+
+class RegionMovieSales(models.Model):
+    id = models.AutoField(primary_key=True)
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, null=True, blank=True, related_name='movie_sales')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='region_sales')
+    total_quantity = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveIntegerField(default=0)
+    # Log of the exponentially decayed purchase count; see movies.trending.trend_score.
+    trend_log = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['region', 'movie'], name='unique_region_movie_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['region', '-total_quantity'], name='region_sales_rank_idx'),
+            models.Index(fields=['region', '-trend_log'], name='region_sales_trend_idx'),
+        ]
+
+    def __str__(self):
+        region_name = self.region.name if self.region else 'Unassigned'
+        return f"{region_name} - {self.movie.name}: {self.total_quantity}"
+
+
+class MovieTrend(models.Model):
+    """Store-wide decayed purchase count of a movie, kept next to the per-region ones."""
+
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='trend')
+    trend_log = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-trend_log'], name='movie_trend_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie.name}: {self.trend_log}"
+
+
+class MovieSalesBucket(models.Model):
+    """Copies of a movie sold in one region during one hour (``hour`` is the hour's start)."""
+
+    id = models.AutoField(primary_key=True)
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, null=True, blank=True, related_name='sales_buckets')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='sales_buckets')
+    hour = models.DateTimeField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['region', 'movie', 'hour'], name='unique_sales_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='sales_bucket_hour_idx'),
+            models.Index(fields=['region', 'hour'], name='sales_bucket_region_hour_idx'),
+        ]
+
+    def __str__(self):
+        region_name = self.region.name if self.region else 'Unassigned'
+        return f"{region_name} - {self.movie.name} @ {self.hour:%Y-%m-%d %H:00}: {self.quantity}"
+
+
+@receiver(post_save, sender=Movie)
+def index_movie_for_search(sender, instance, **kwargs):
+    get_search_backend().index_movie(instance)
+    movie_name_index.invalidate()
+
+
+@receiver(post_save, sender=Movie)
+def create_movie_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generate_thumbnails(instance.image.name)
+
+
+@receiver(post_delete, sender=Movie)
+def remove_movie_from_search(sender, instance, **kwargs):
+    get_search_backend().remove_movie(instance.id)
+    movie_name_index.invalidate()
+
+
+def bump_movie_cache_version(movie_id):
+    Movie.objects.filter(id=movie_id).update(cache_version=F('cache_version') + 1)
+
+
+@receiver(post_save, sender=Movie)
+def bump_cache_version_on_movie_save(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        bump_movie_cache_version(instance.id)
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_cache_version_on_feedback(sender, instance, **kwargs):
+    bump_movie_cache_version(instance.movie_id)
@@ -0,0 +1,222 @@
+import base64
+import binascii
+import datetime
+import json
+import math
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset plus the cursors around it."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.next_url = None
+        self.previous_url = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep full microsecond precision; DjangoJSONEncoder rounds to milliseconds."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, queryset, fields):
+    """Turn a cursor back into typed values, or None if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+    decoded = []
+    for field_name, value in zip(fields, values):
+        # Cursors only ever hold scalars; anything else was forged or mangled.
+        if value is None or isinstance(value, (dict, list)):
+            return None
+        try:
+            field = queryset.model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # Annotations in an ordering (such as search_rank) are numeric.
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return None
+            if not math.isfinite(value):
+                return None
+            decoded.append(value)
+            continue
+        try:
+            value = field.to_python(value)
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if value is None:
+            return None
+        decoded.append(value)
+    return decoded
+
+
+def _cursor_values(obj, fields):
+    values = []
+    for field_name in fields:
+        if isinstance(obj, dict):
+            values.append(obj[field_name])
+        else:
+            field_value = getattr(obj, field_name)
+            values.append(getattr(field_value, 'pk', field_value))
+    return values
+
+
+def _after_filter(ordering, values, reverse=False):
+    """Build the WHERE clause selecting rows strictly after ``values``."""
+    condition = Q()
+    equal = Q()
+    for term, value in zip(ordering, values):
+        descending = term.startswith('-')
+        field_name = term.lstrip('-')
+        lookup = 'lt' if descending != reverse else 'gt'
+        condition |= equal & Q(**{f'{field_name}__{lookup}': value})
+        equal &= Q(**{field_name: value})
+    return condition
+
+
+def _keyset_query(queryset, ordering, per_page, after=None, before=None):
+    """Return ``(rows, backwards, has_cursor)`` for one page of ``queryset``."""
+    fields = [term.lstrip('-') for term in ordering]
+    reversed_ordering = [term[1:] if term.startswith('-') else f'-{term}' for term in ordering]
+
+    cursor_values = None
+    backwards = False
+    if before:
+        cursor_values = decode_cursor(before, queryset, fields)
+        backwards = cursor_values is not None
+    elif after:
+        cursor_values = decode_cursor(after, queryset, fields)
+
+    if backwards:
+        rows = queryset.filter(_after_filter(ordering, cursor_values, reverse=True))
+        rows = rows.order_by(*reversed_ordering)[:per_page + 1]
+    else:
+        rows = queryset
+        if cursor_values is not None:
+            rows = rows.filter(_after_filter(ordering, cursor_values))
+        rows = rows.order_by(*ordering)[:per_page + 1]
+    return rows, backwards, cursor_values is not None
+
+
+def _keyset_page(rows, ordering, per_page, backwards, has_cursor):
+    fields = [term.lstrip('-') for term in ordering]
+    if backwards:
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+        has_previous = has_more
+    else:
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = has_cursor
+
+    next_cursor = None
+    previous_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(_cursor_values(rows[-1], fields))
+    if rows and has_previous:
+        previous_cursor = encode_cursor(_cursor_values(rows[0], fields))
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def keyset_paginate(queryset, ordering, per_page, after=None, before=None):
+    """Return a KeysetPage of ``queryset`` ordered by ``ordering``.
+
+    ``ordering`` must end in a unique column (normally ``id``) so every row has
+    a distinct position. Pages are selected with a WHERE clause on the last row
+    seen instead of an OFFSET, so every page costs the same to fetch.
+    """
+    rows, backwards, has_cursor = _keyset_query(queryset, ordering, per_page, after, before)
+    return _keyset_page(list(rows), ordering, per_page, backwards, has_cursor)
+
+
+async def akeyset_paginate(queryset, ordering, per_page, after=None, before=None):
+    """Async version of ``keyset_paginate``."""
+    rows, backwards, has_cursor = _keyset_query(queryset, ordering, per_page, after, before)
+    return _keyset_page([row async for row in rows], ordering, per_page, backwards, has_cursor)
+
+
+def get_page_size(request, default):
+    """Read ``per_page`` from the query string, bounded by MAX_PAGE_SIZE."""
+    try:
+        per_page = int(request.GET.get('per_page', default))
+    except (TypeError, ValueError):
+        per_page = default
+    return max(1, min(per_page, settings.MAX_PAGE_SIZE))
+
+
+def _add_page_urls(request, page):
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    if page.has_next:
+        params['after'] = page.next_cursor
+        page.next_url = '?' + params.urlencode()
+        params.pop('after')
+    if page.has_previous:
+        params['before'] = page.previous_cursor
+        page.previous_url = '?' + params.urlencode()
+    return page
+
+
+def paginate_request(request, queryset, ordering, default_per_page):
+    """Keyset-paginate ``queryset`` from the ``after``/``before`` query params.
+
+    The returned page carries ``next_url``/``previous_url`` that keep the other
+    query parameters (search terms, page size) intact.
+    """
+    page = keyset_paginate(
+        queryset,
+        ordering,
+        get_page_size(request, default_per_page),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return _add_page_urls(request, page)
+
+
+async def apaginate_request(request, queryset, ordering, default_per_page):
+    """Async version of ``paginate_request``."""
+    page = await akeyset_paginate(
+        queryset,
+        ordering,
+        get_page_size(request, default_per_page),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return _add_page_urls(request, page)
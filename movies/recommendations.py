@@ -0,0 +1,110 @@
+import numpy as np
+from django.db import transaction
+
+from .models import Movie, MovieNeighbor, Rating
+
+PURCHASE_WEIGHT = 1.0
+
+
+def load_interactions():
+    """Return ``(user_ids, movie_ids, weights)`` arrays, one entry per user/movie pair.
+
+    A purchase counts as PURCHASE_WEIGHT and a rating as ``value / 5``; when a
+    user both bought and rated a movie the stronger signal is kept.
+    """
+    from cart.models import Item
+
+    strengths = {}
+    purchases = Item.objects.values_list('order__user_id', 'movie_id').distinct()
+    for user_id, movie_id in purchases.iterator(chunk_size=2000):
+        strengths[user_id, movie_id] = PURCHASE_WEIGHT
+    for user_id, movie_id, value in Rating.objects.values_list('user_id', 'movie_id', 'value').iterator(chunk_size=2000):
+        key = (user_id, movie_id)
+        strengths[key] = max(strengths.get(key, 0.0), value / 5)
+
+    if not strengths:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    pairs = np.fromiter((component for key in strengths for component in key), dtype=np.int64, count=2 * len(strengths))
+    pairs = pairs.reshape(-1, 2)
+    weights = np.fromiter(strengths.values(), dtype=np.float32, count=len(strengths))
+    return pairs[:, 0], pairs[:, 1], weights
+
+
+def item_neighbors(user_ids, movie_ids, weights, top_k, block_size=256, max_elements=1 << 23):
+    """Compute the ``top_k`` most cosine-similar movies of every movie.
+
+    The user x movie matrix stays sparse, as parallel index/weight arrays
+    sorted by movie. Similarities are computed for ``block_size`` movies at a
+    time: the block's columns are densified over just the users who touched
+    them and multiplied against the sparse matrix with a segmented
+    ``np.add.reduceat``. ``max_elements`` bounds the size of every
+    intermediate array, so memory does not grow with the number of users.
+
+    Returns ``{movie_id: [(neighbor_id, score), ...]}`` ordered by score.
+    """
+    if len(weights) == 0:
+        return {}
+    movie_keys, items = np.unique(movie_ids, return_inverse=True)
+    _, users = np.unique(user_ids, return_inverse=True)
+    order = np.argsort(items, kind='stable')
+    items, users, weights = items[order], users[order], weights[order]
+    n_items, n_users = len(movie_keys), int(users.max()) + 1
+    norms = np.sqrt(np.bincount(items, weights=weights.astype(np.float64) ** 2, minlength=n_items))
+    item_starts = np.searchsorted(items, np.arange(n_items + 1))
+    block_size = max(1, min(block_size, max_elements // n_users))
+    k = min(top_k, n_items - 1)
+    if k <= 0:
+        return {}
+
+    neighbors = {}
+    for start in range(0, n_items, block_size):
+        stop = min(start + block_size, n_items)
+        block = slice(item_starts[start], item_starts[stop])
+        block_users, local_users = np.unique(users[block], return_inverse=True)
+        dense = np.zeros((len(block_users), stop - start), dtype=np.float32)
+        dense[local_users, items[block] - start] = weights[block]
+        position = np.full(n_users, -1)
+        position[block_users] = np.arange(len(block_users))
+        # Only interactions of users who touched the block contribute.
+        relevant = np.flatnonzero(position[users] >= 0)
+
+        # similarity[i, j] = sum over users of weight(u, i) * weight(u, start + j)
+        similarity = np.zeros((n_items, stop - start), dtype=np.float64)
+        rows_per_chunk = max(1, max_elements // (stop - start))
+        for chunk_start in range(0, len(relevant), rows_per_chunk):
+            chunk = relevant[chunk_start:chunk_start + rows_per_chunk]
+            chunk_items = items[chunk]
+            contributions = weights[chunk, None] * dense[position[users[chunk]]]
+            segment_starts = np.flatnonzero(np.r_[True, chunk_items[1:] != chunk_items[:-1]])
+            similarity[chunk_items[segment_starts]] += np.add.reduceat(contributions, segment_starts, axis=0)
+
+        similarity /= np.outer(norms, norms[start:stop])
+        similarity[np.arange(start, stop), np.arange(stop - start)] = 0
+        top = np.argpartition(-similarity, k - 1, axis=0)[:k]
+        for column in range(stop - start):
+            candidates = top[:, column]
+            ranked = candidates[np.argsort(-similarity[candidates, column], kind='stable')]
+            neighbors[int(movie_keys[start + column])] = [
+                (int(movie_keys[row]), float(similarity[row, column]))
+                for row in ranked
+                if similarity[row, column] > 0
+            ]
+    return neighbors
+
+
+def build_recommendations(top_k=10):
+    """Recompute the MovieNeighbor table. Returns the number of rows written."""
+    neighbors = item_neighbors(*load_interactions(), top_k=top_k)
+    existing = set(Movie.objects.values_list('id', flat=True))
+    rows = []
+    for movie_id, ranked in neighbors.items():
+        if movie_id not in existing:
+            continue
+        ranked = [(neighbor_id, score) for neighbor_id, score in ranked if neighbor_id in existing]
+        for rank, (neighbor_id, score) in enumerate(ranked, start=1):
+            rows.append(MovieNeighbor(movie_id=movie_id, neighbor_id=neighbor_id, rank=rank, score=score))
+    with transaction.atomic():
+        MovieNeighbor.objects.all().delete()
+        MovieNeighbor.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
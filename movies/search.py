@@ -0,0 +1,94 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BaseSearchBackend:
+    """Interface for movie search backends.
+
+    ``search`` narrows a Movie queryset to the matches for ``query`` and
+    returns it together with the keyset ``ordering`` the results should be
+    paginated by. The ``index_movie``/``remove_movie`` hooks are called from
+    the Movie save/delete signals so backends with their own index stay in sync.
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index_movie(self, movie):
+        pass
+
+    def remove_movie(self, movie_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """Portable fallback: substring match on name and description."""
+
+    def search(self, queryset, query):
+        queryset = queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+        return queryset, ['name', 'id']
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """SQLite FTS5 index over Movie.name and Movie.description.
+
+    Every word in the query is matched as a prefix, and results are ranked by
+    the table's ``rank`` column, which the migration configures as bm25 with
+    matches in the name weighted above matches in the description.
+    """
+
+    table = 'movies_movie_fts'
+
+    def build_match(self, query):
+        tokens = TOKEN_RE.findall(query)
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, queryset, query):
+        match = self.build_match(query)
+        if not match:
+            return queryset.none(), ['name', 'id']
+        # Join through the unmanaged MovieSearchIndex model so SQLite drives
+        # the query from the FTS index and only looks up the matching movies.
+        matches = ExpressionWrapper(RawSQL(f'{self.table} MATCH %s', (match,)), output_field=BooleanField())
+        queryset = (
+            queryset.filter(search_index__isnull=False)
+            .filter(matches)
+            .annotate(search_rank=F('search_index__rank'))
+        )
+        return queryset, ['search_rank', 'id']
+
+    def index_movie(self, movie):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [movie.id])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description) VALUES (%s, %s, %s)',
+                [movie.id, movie.name, movie.description],
+            )
+
+    def remove_movie(self, movie_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [movie_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description) '
+                'SELECT id, name, description FROM movies_movie'
+            )
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    return import_string(settings.MOVIES_SEARCH_BACKEND)()
@@ -0,0 +1,19 @@
+from django import template
+
+from movies.images import fallback_format, thumbnail_srcset
+
+register = template.Library()
+
+
+@register.inclusion_tag('movies/responsive_image.html')
+def responsive_image(image, sizes, css_class='', loading='lazy', alt=''):
+    """Render ``image`` as a <picture> offering its WebP and resized variants."""
+    return {
+        'src': image.url,
+        'webp_srcset': thumbnail_srcset(image.name, 'webp'),
+        'fallback_srcset': thumbnail_srcset(image.name, fallback_format(image.name)),
+        'sizes': sizes,
+        'css_class': css_class,
+        'loading': loading,
+        'alt': alt,
+    }
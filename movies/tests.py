@@ -1,3 +1,847 @@
-from django.test import TestCase
+import datetime
+import importlib
+import io
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.db.models import F, Sum
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from cart.models import Item, Order
+from PIL import Image
+
+from .autocomplete import movie_name_index
+from .images import derivative_name
+from .pagination import encode_cursor
+from .recommendations import build_recommendations
+from .models import (
+    Movie,
+    MovieNeighbor,
+    MovieRequest,
+    MovieRequestVote,
+    MovieSalesBucket,
+    MovieTrend,
+    Rating,
+    Region,
+    RegionMovieSales,
+    Review,
+)
+from .utils import (
+    rebuild_region_sales,
+    reconcile_rating_aggregates,
+    record_region_sales,
+    top_movies_per_region,
+    trending_movies,
+    windowed_sales,
+)
+
+
+class TopMoviesPerRegionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movies = [
+            Movie.objects.create(name=f'Movie {i}', price=10, description='', image='movie_images/test.jpg')
+            for i in range(8)
+        ]
+
+    def create_regions(self, count, start=0):
+        regions = Region.objects.bulk_create(
+            Region(name=f'Region {i}', code=f'region-{i}', center_lat=0, center_lng=0)
+            for i in range(start, start + count)
+        )
+        RegionMovieSales.objects.bulk_create(
+            RegionMovieSales(region=region, movie=movie, total_quantity=(i + j) % 8 + 1, revenue=10)
+            for i, region in enumerate(regions)
+            for j, movie in enumerate(self.movies)
+        )
+        return regions
+
+    def test_returns_top_n_for_each_region(self):
+        regions = self.create_regions(3)
+        by_region = top_movies_per_region(limit=3)
+        for region in regions:
+            totals = [entry['total'] for entry in by_region[region.id]]
+            self.assertEqual(totals, [8, 7, 6])
+
+    def test_fallback_without_window_functions(self):
+        self.create_regions(3)
+        expected = top_movies_per_region(limit=2)
+        with mock.patch.object(connection.features, 'supports_over_clause', False):
+            self.assertEqual(top_movies_per_region(limit=2), expected)
+
+    def test_query_count_does_not_grow_with_regions(self):
+        self.create_regions(6)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(top_movies_per_region()), 6)
+        self.create_regions(300, start=6)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(top_movies_per_region()), 306)
+
+
+class RegionSalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.north, cls.south = Region.objects.all()[:2]
+        cls.movies = [
+            Movie.objects.create(name=f'Movie {i}', price=10 + i, description='', image='movie_images/test.jpg')
+            for i in range(2)
+        ]
+        cls.user = User.objects.create_user(username='buyer', password='password')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def purchase(self, region, *quantities):
+        self.user.profile.region = region
+        self.user.profile.save()
+        session = self.client.session
+        session['cart'] = {str(movie.id): str(quantity) for movie, quantity in zip(self.movies, quantities)}
+        session.save()
+        self.client.post(reverse('cart.purchase'))
+
+    def history(self):
+        rows = (
+            Item.objects.values_list('order__region_id', 'movie_id')
+            .annotate(total_quantity=Sum('quantity'), revenue=Sum(F('price') * F('quantity')))
+            .order_by()
+        )
+        return sorted(rows)
+
+    def rollup(self):
+        return sorted(RegionMovieSales.objects.values_list('region_id', 'movie_id', 'total_quantity', 'revenue'))
+
+    def test_purchase_updates_rollup(self):
+        self.purchase(self.north, 2, 1)
+        self.purchase(self.north, 3, 4)
+        self.purchase(self.south, 1, 1)
+        self.assertEqual(
+            self.rollup(),
+            sorted([
+                (self.north.id, self.movies[0].id, 5, 50),
+                (self.north.id, self.movies[1].id, 5, 55),
+                (self.south.id, self.movies[0].id, 1, 10),
+                (self.south.id, self.movies[1].id, 1, 11),
+            ]),
+        )
+        self.assertEqual(self.rollup(), self.history())
+
+    def test_backfill_migration_matches_item_history(self):
+        self.purchase(self.north, 2, 1)
+        self.purchase(self.south, 3, 4)
+        RegionMovieSales.objects.all().delete()
+        migration = importlib.import_module('movies.migrations.0009_regionmoviesales_backfill')
+        migration.backfill_region_sales(apps, None)
+        self.assertEqual(self.rollup(), self.history())
+
+    def test_rebuild_command_matches_item_history(self):
+        self.purchase(self.north, 2, 1)
+        self.purchase(self.south, 3, 4)
+        RegionMovieSales.objects.update(total_quantity=99, revenue=0)
+        out = io.StringIO()
+        call_command('rebuild_region_sales', stdout=out)
+        self.assertIn('Rebuilt 4 region sales rows.', out.getvalue())
+        self.assertEqual(self.rollup(), self.history())
+
+    def test_map_reads_from_rollup(self):
+        RegionMovieSales.objects.create(region=self.north, movie=self.movies[0], total_quantity=42, revenue=420)
+        response = self.client.get(reverse('movies.popularity_map_data'))
+        region = next(r for r in response.json()['regions'] if r['id'] == self.north.id)
+        self.assertEqual(region['top_movies'], [{'movie_id': self.movies[0].id, 'title': 'Movie 0', 'total': 42}])
+        self.assertEqual(region['total_purchases'], 42)
+
+    def test_rollup_is_read_only_in_the_admin(self):
+        self.purchase(self.north, 2, 1)
+        self.purchase(self.south, 3, 4)
+        row = RegionMovieSales.objects.first()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('admin:movies_regionmoviesales_changelist'))
+        self.assertContains(response, 'Movie 0')
+        self.client.post(reverse('admin:movies_regionmoviesales_change', args=[row.id]), {'total_quantity': 99})
+        self.assertEqual(self.rollup(), self.history())
+
+
+class PopularityMapDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.region = Region.objects.first()
+        self.movie = Movie.objects.create(name='Movie', price=10, description='', image='movie_images/test.jpg')
+        self.user = User.objects.create_user(username='buyer', password='password')
+
+    def purchase(self, quantity):
+        order = Order.objects.create(user=self.user, total=10 * quantity, region=self.region)
+        item = Item.objects.create(order=order, movie=self.movie, price=10, quantity=quantity)
+        with self.captureOnCommitCallbacks(execute=True):
+            record_region_sales(self.region, [item])
+
+    def test_serves_payload_with_cache_headers(self):
+        self.purchase(2)
+        response = self.client.get(reverse('movies.popularity_map_data'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+        payload = response.json()
+        region = next(r for r in payload['regions'] if r['id'] == self.region.id)
+        self.assertEqual(region['top_movies'][0]['total'], 2)
+        self.assertEqual(payload['global_trending'][0]['movie_id'], self.movie.id)
+
+    def test_conditional_get_returns_not_modified(self):
+        response = self.client.get(reverse('movies.popularity_map_data'))
+        # Only the latest order id is read; the payload comes from the cache.
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('movies.popularity_map_data'), HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_order_invalidates_payload(self):
+        first = self.client.get(reverse('movies.popularity_map_data'))
+        self.purchase(3)
+        second = self.client.get(reverse('movies.popularity_map_data'))
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        self.assertEqual(second.json()['global_trending'][0]['total'], 3)
+
+    def test_order_from_another_worker_changes_payload(self):
+        first = self.client.get(reverse('movies.popularity_map_data'))
+        # Another process records an order: nothing in this process's cache is cleared.
+        order = Order.objects.create(user=self.user, total=10, region=self.region)
+        item = Item.objects.create(order=order, movie=self.movie, price=10, quantity=1)
+        with mock.patch.object(cache, 'delete') as delete:
+            record_region_sales(self.region, [item])
+        delete.assert_not_called()
+        second = self.client.get(reverse('movies.popularity_map_data'))
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        self.assertEqual(second.json()['global_trending'][0]['movie_id'], self.movie.id)
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=24, TRENDING_WINDOW_HOURS=24)
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.north, cls.south = Region.objects.all()[:2]
+        cls.old_hit = Movie.objects.create(name='Old Hit', price=10, description='', image='movie_images/test.jpg')
+        cls.new_hit = Movie.objects.create(name='New Hit', price=10, description='', image='movie_images/test.jpg')
+        cls.user = User.objects.create_user(username='buyer')
+        cls.now = timezone.now()
+
+    def purchase(self, region, movie, quantity, hours_ago):
+        when = self.now - datetime.timedelta(hours=hours_ago)
+        order = Order.objects.create(user=self.user, total=10 * quantity, region=region)
+        Order.objects.filter(pk=order.pk).update(date=when)
+        item = Item.objects.create(order=order, movie=movie, price=10, quantity=quantity)
+        record_region_sales(region, [item], when=when)
+
+    def test_recent_purchases_outrank_older_larger_ones(self):
+        self.purchase(self.north, self.old_hit, 8, hours_ago=48)
+        self.purchase(self.south, self.new_hit, 3, hours_ago=0)
+
+        trending = trending_movies(now=self.now)
+        self.assertEqual([entry['movie_id'] for entry in trending], [self.new_hit.id, self.old_hit.id])
+        self.assertEqual(trending[0]['score'], 3)
+        self.assertEqual(trending[1]['score'], 2)
+        self.assertEqual([entry['total'] for entry in trending], [3, 0])
+
+    def test_scores_accumulate_per_region(self):
+        self.purchase(self.north, self.old_hit, 2, hours_ago=24)
+        self.purchase(self.north, self.old_hit, 1, hours_ago=0)
+        self.purchase(self.south, self.new_hit, 1, hours_ago=0)
+
+        north = trending_movies(region=self.north, now=self.now)
+        self.assertEqual(len(north), 1)
+        self.assertEqual(north[0]['score'], 2)
+        self.assertEqual(north[0]['total'], 1)
+        self.assertEqual(MovieSalesBucket.objects.filter(movie=self.old_hit).count(), 2)
+        self.assertEqual(trending_movies(region=self.south, now=self.now)[0]['movie_id'], self.new_hit.id)
+
+    def test_windowed_sales_reads_only_recent_buckets(self):
+        self.purchase(self.north, self.old_hit, 5, hours_ago=30)
+        self.purchase(self.north, self.new_hit, 2, hours_ago=1)
+        self.purchase(self.south, self.new_hit, 2, hours_ago=0)
+
+        self.assertEqual(
+            [(row['movie_id'], row['total']) for row in windowed_sales(24, now=self.now)],
+            [(self.new_hit.id, 4)],
+        )
+        self.assertEqual(
+            [(row['movie_id'], row['total']) for row in windowed_sales(48, now=self.now)],
+            [(self.old_hit.id, 5), (self.new_hit.id, 4)],
+        )
+        self.assertEqual(windowed_sales(48, region=self.south, now=self.now)[0]['total'], 2)
+
+    @override_settings(TRENDING_HALF_LIFE_HOURS=72)
+    def test_backfill_migration_matches_rebuild(self):
+        self.purchase(self.north, self.old_hit, 2, hours_ago=30)
+        self.purchase(self.south, self.new_hit, 4, hours_ago=0)
+        rebuild_region_sales()
+        expected = sorted(MovieTrend.objects.values_list('movie_id', 'trend_log'))
+        buckets = sorted(MovieSalesBucket.objects.values_list('region_id', 'movie_id', 'hour', 'quantity'))
+        MovieTrend.objects.all().delete()
+        MovieSalesBucket.objects.all().delete()
+        RegionMovieSales.objects.update(trend_log=None)
+
+        importlib.import_module('movies.migrations.0018_trending').backfill_trends(apps, None)
+        for (movie_id, trend_log), (expected_id, expected_log) in zip(
+            sorted(MovieTrend.objects.values_list('movie_id', 'trend_log')), expected
+        ):
+            self.assertEqual(movie_id, expected_id)
+            self.assertAlmostEqual(trend_log, expected_log, places=6)
+        self.assertEqual(sorted(MovieSalesBucket.objects.values_list('region_id', 'movie_id', 'hour', 'quantity')), buckets)
+        self.assertFalse(RegionMovieSales.objects.filter(trend_log__isnull=True).exists())
+
+    def test_rebuild_matches_incremental_updates(self):
+        self.purchase(self.north, self.old_hit, 2, hours_ago=30)
+        self.purchase(self.north, self.old_hit, 1, hours_ago=2)
+        self.purchase(self.south, self.new_hit, 4, hours_ago=0)
+
+        def snapshot():
+            return (
+                sorted(RegionMovieSales.objects.values_list('region_id', 'movie_id', 'total_quantity', 'trend_log')),
+                sorted(MovieTrend.objects.values_list('movie_id', 'trend_log')),
+                sorted(MovieSalesBucket.objects.values_list('region_id', 'movie_id', 'hour', 'quantity')),
+            )
+
+        before = snapshot()
+        rebuild_region_sales()
+        after = snapshot()
+        self.assertEqual([row[:3] for row in after[0]], [row[:3] for row in before[0]])
+        for (*_, rebuilt), (*_, incremental) in zip(after[0] + after[1], before[0] + before[1]):
+            self.assertAlmostEqual(rebuilt, incremental, places=6)
+        self.assertEqual(after[2], before[2])
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(name='Movie', price=10, description='', image='movie_images/test.jpg')
+        self.user = User.objects.create_user(username='rater', password='password')
+        self.client.force_login(self.user)
+
+    def rate(self, **data):
+        self.client.post(reverse('movies.rate', args=[self.movie.id]), data)
+        self.movie.refresh_from_db()
+        return self.movie
+
+    def test_admin_edit_never_writes_rating_totals(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        url = reverse('admin:movies_movie_change', args=[self.movie.id])
+        self.assertNotIn('rating_sum', self.client.get(url).context['adminform'].form.fields)
+        Movie.objects.filter(id=self.movie.id).update(rating_sum=F('rating_sum') + 5, rating_count=F('rating_count') + 1)
+        data = {'name': 'Renamed', 'price': 12, 'description': 'New', 'rating_sum': 0, 'rating_count': 0}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "movies_movie"')]
+        self.assertTrue(updates)
+        self.assertFalse(any('"rating_sum"' in sql for sql in updates))
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.name, self.movie.price), ('Renamed', 12))
+        self.assertEqual((self.movie.rating_sum, self.movie.rating_count), (5, 1))
+
+    def test_admin_rating_deletes_adjust_totals_and_edits_are_refused(self):
+        self.rate(rating=4)
+        other = User.objects.create_user(username='other')
+        Rating.objects.create(movie=self.movie, user=other, value=2)
+        Movie.objects.filter(id=self.movie.id).update(rating_sum=F('rating_sum') + 2, rating_count=F('rating_count') + 1)
+        ratings = list(Rating.objects.filter(movie=self.movie).order_by('value'))
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+        self.assertEqual(self.client.get(reverse('admin:movies_rating_add')).status_code, 403)
+        url = reverse('admin:movies_rating_change', args=[ratings[0].id])
+        self.client.post(url, {'movie': self.movie.id, 'user': other.id, 'value': 5})
+        self.assertEqual(Rating.objects.get(id=ratings[0].id).value, 2)
+
+        self.client.post(reverse('admin:movies_rating_delete', args=[ratings[0].id]), {'post': 'yes'})
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_sum, self.movie.rating_count), (4, 1))
+        self.client.post(
+            reverse('admin:movies_rating_changelist'),
+            {'action': 'delete_selected', '_selected_action': [ratings[1].id], 'post': 'yes'},
+        )
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_sum, self.movie.rating_count), (0, 0))
+        self.assertEqual(reconcile_rating_aggregates(fix=False), [])
+
+    def test_set_update_and_clear_keep_totals_in_sync(self):
+        movie = self.rate(rating=4)
+        self.assertEqual((movie.rating_sum, movie.rating_count), (4, 1))
+        movie = self.rate(rating=2)
+        self.assertEqual((movie.rating_sum, movie.rating_count), (2, 1))
+        self.assertEqual(movie.average_rating, 2)
+        movie = self.rate(action='clear')
+        self.assertEqual((movie.rating_sum, movie.rating_count), (0, 0))
+        self.assertIsNone(movie.average_rating)
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.rate(rating=5)
+        Movie.objects.filter(id=self.movie.id).update(rating_sum=1, rating_count=3)
+        version = Movie.objects.get(id=self.movie.id).cache_version
+        drifted = reconcile_rating_aggregates()
+        self.assertEqual([(movie.id, total, count) for movie, total, count in drifted], [(self.movie.id, 5, 1)])
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_sum, self.movie.rating_count), (5, 1))
+        self.assertEqual(self.movie.cache_version, version + 1)
+        self.assertEqual(reconcile_rating_aggregates(), [])
+
+
+class CatalogPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(30):
+            Movie.objects.create(name=f'Movie {i % 7}', price=10, description='', image='movie_images/test.jpg')
+
+    def test_walks_catalog_forward_and_back_by_name_and_id(self):
+        expected = list(Movie.objects.order_by('name', 'id').values_list('id', flat=True))
+        seen = []
+        pages = []
+        query = '?per_page=8'
+        while query:
+            response = self.client.get(reverse('movies.index') + query)
+            page = response.context['template_data']['page']
+            pages.append(page)
+            seen.extend(movie.id for movie in page)
+            query = page.next_url
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 4)
+
+        response = self.client.get(reverse('movies.index') + pages[-1].previous_url)
+        page = response.context['template_data']['page']
+        self.assertEqual([movie.id for movie in page], [movie.id for movie in pages[-2]])
+
+    def test_search_results_are_paginated(self):
+        response = self.client.get(reverse('movies.index'), {'search': 'Movie 3', 'per_page': 2})
+        page = response.context['template_data']['page']
+        self.assertEqual(len(page), 2)
+        self.assertIn('search=Movie+3', page.next_url)
+
+    def test_page_size_is_bounded(self):
+        response = self.client.get(reverse('movies.index'), {'per_page': 1000})
+        self.assertEqual(len(response.context['template_data']['page']), 30)
+        response = self.client.get(reverse('movies.index'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+
+
+    def test_forged_cursors_return_the_first_page(self):
+        first = self.client.get(reverse('movies.index'), {'per_page': 5}).context['template_data']['page']
+        for values in ([None, None], [{'x': 1}, 1], [['Movie 1'], 1], ['Movie 1', 'not-an-id']):
+            for direction in ('after', 'before'):
+                response = self.client.get(reverse('movies.index'), {'per_page': 5, direction: encode_cursor(values)})
+                self.assertEqual(response.status_code, 200)
+                page = response.context['template_data']['page']
+                self.assertEqual([movie.id for movie in page], [movie.id for movie in first])
+
+class MovieSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.star = Movie.objects.create(
+            name='Star Voyage', price=10, description='A trip across the galaxy.', image='movie_images/test.jpg'
+        )
+        cls.ocean = Movie.objects.create(
+            name='Deep Ocean', price=10, description='Submarine crew finds a star map.', image='movie_images/test.jpg'
+        )
+        cls.other = Movie.objects.create(
+            name='Quiet Town', price=10, description='Nothing happens.', image='movie_images/test.jpg'
+        )
+
+    def search(self, term, **params):
+        response = self.client.get(reverse('movies.index'), {'search': term, **params})
+        return response.context['template_data']['page']
+
+    def test_matches_descriptions_and_ranks_name_matches_first(self):
+        self.assertEqual([movie.id for movie in self.search('star')], [self.star.id, self.ocean.id])
+
+    def test_matches_word_prefixes(self):
+        self.assertEqual([movie.id for movie in self.search('subm')], [self.ocean.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.other.name = 'Star Town'
+        self.other.save()
+        self.assertIn(self.other.id, [movie.id for movie in self.search('star')])
+        self.star.delete()
+        self.assertNotIn(self.star.id, [movie.id for movie in self.search('voyage')])
+
+    def test_ranked_results_paginate_without_gaps(self):
+        for i in range(5):
+            Movie.objects.create(name=f'Star {i}', price=10, description='', image='movie_images/test.jpg')
+        seen = []
+        page = self.search('star', per_page=2)
+        seen.extend(movie.id for movie in page)
+        while page.has_next:
+            page = self.search('star', per_page=2, after=page.next_cursor)
+            seen.extend(movie.id for movie in page)
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_forged_rank_cursors_return_the_first_page(self):
+        first = [movie.id for movie in self.search('star')]
+        for values in ([{'a': 1}, 1], ['high', 1], [None, 1], ['NaN', 1]):
+            page = self.search('star', after=encode_cursor(values))
+            self.assertEqual([movie.id for movie in page], first)
+
+    def test_punctuation_only_query_returns_nothing(self):
+        self.assertEqual(len(self.search('"*')), 0)
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.star_wars = Movie.objects.create(name='Star Wars', price=10, description='', image='movie_images/test.jpg')
+        cls.stardust = Movie.objects.create(name='Stardust', price=10, description='', image='movie_images/test.jpg')
+        Movie.objects.create(name='Avatar', price=10, description='', image='movie_images/test.jpg')
+
+    def setUp(self):
+        movie_name_index.invalidate()
+
+    def suggest(self, query):
+        response = self.client.get(reverse('movies.autocomplete'), {'q': query})
+        return [result['name'] for result in response.json()['results']]
+
+    def test_matches_name_and_word_prefixes_case_insensitively(self):
+        self.assertEqual(self.suggest('STAR'), ['Star Wars', 'Stardust'])
+        self.assertEqual(self.suggest('wa'), ['Star Wars'])
+        self.assertEqual(self.suggest('star w'), ['Star Wars'])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_answers_from_memory_after_first_load(self):
+        self.suggest('a')
+        with self.assertNumQueries(0):
+            self.suggest('av')
+
+    def test_index_reloads_after_movie_changes(self):
+        self.suggest('a')
+        self.stardust.name = 'Arrival'
+        self.stardust.save()
+        self.assertEqual(self.suggest('arr'), ['Arrival'])
+        self.star_wars.delete()
+        self.assertEqual(self.suggest('star'), [])
+
+
+class MovieReviewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(name='Movie', price=10, description='', image='movie_images/test.jpg')
+        users = [User.objects.create_user(username=f'reviewer{i}', password='password') for i in range(30)]
+        Review.objects.bulk_create(
+            Review(movie=cls.movie, user=user, comment=f'Review {i}') for i, user in enumerate(users)
+        )
+
+    def get_page(self, **params):
+        response = self.client.get(reverse('movies.show', args=[self.movie.id]), params)
+        return response.context['template_data']['reviews_page']
+
+    def test_reviews_are_paginated_newest_first(self):
+        expected = list(Review.objects.order_by('-date', '-id').values_list('id', flat=True))
+        page = self.get_page(per_page=12)
+        seen = [review.id for review in page]
+        while page.has_next:
+            page = self.get_page(per_page=12, after=page.next_cursor)
+            seen.extend(review.id for review in page)
+        self.assertEqual(seen, expected)
+
+    def test_review_authors_are_loaded_with_the_reviews(self):
+        with CaptureQueriesContext(connection) as small:
+            self.get_page(per_page=1)
+        with CaptureQueriesContext(connection) as large:
+            self.get_page(per_page=30)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class AsyncCatalogViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='viewer', password='password')
+        cls.movie = Movie.objects.create(name='Movie', price=10, description='', image='movie_images/test.jpg')
+        Rating.objects.create(movie=cls.movie, user=cls.user, value=4)
+        Review.objects.create(movie=cls.movie, user=cls.user, comment='Great')
+
+    async def test_catalog_pages_render_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('movies.index'), {'search': 'movie'})
+        self.assertEqual([movie.id for movie in response.context['template_data']['movies']], [self.movie.id])
+        self.assertContains(response, 'viewer')
+
+        response = await self.async_client.get(reverse('movies.show', args=[self.movie.id]))
+        template_data = response.context['template_data']
+        self.assertEqual(template_data['user_rating'], 4)
+        self.assertEqual([review.user.username for review in template_data['reviews']], ['viewer'])
+
+    async def test_unknown_movie_is_not_found(self):
+        response = await self.async_client.get(reverse('movies.show', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='viewer', password='password')
+        cls.movie = Movie.objects.create(name='Original', price=10, description='', image='movie_images/test.jpg')
+
+    def setUp(self):
+        cache.clear()
+
+    def rename_without_signals(self, name):
+        Movie.objects.filter(id=self.movie.id).update(name=name)
+
+    def test_cards_are_served_from_cache_until_the_movie_changes(self):
+        self.client.get(reverse('movies.index'))
+        self.rename_without_signals('Renamed')
+        self.assertContains(self.client.get(reverse('movies.index')), 'Original')
+
+        Rating.objects.create(movie=self.movie, user=self.user, value=5)
+        self.assertContains(self.client.get(reverse('movies.index')), 'Renamed')
+
+    def test_movie_save_and_review_changes_bump_the_version(self):
+        movie = Movie.objects.get(id=self.movie.id)
+        movie.price = 12
+        movie.save()
+        movie.refresh_from_db()
+        self.assertEqual(movie.cache_version, 1)
+        review = Review.objects.create(movie=movie, user=self.user, comment='Good')
+        review.delete()
+        movie.refresh_from_db()
+        self.assertEqual(movie.cache_version, 3)
+
+    def test_save_with_update_fields_bumps_the_version(self):
+        self.movie.price = 15
+        self.movie.save(update_fields=['price'])
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.price, self.movie.cache_version), (15, 1))
+
+    def test_movies_can_be_created_with_an_explicit_id(self):
+        Movie.objects.create(id=99, name='Explicit', price=10, description='', image='movie_images/test.jpg')
+        Movie(id=98, name='Unsaved', price=10, description='', image='movie_images/test.jpg').save()
+        self.assertEqual(
+            sorted(Movie.objects.filter(id__in=[98, 99]).values_list('id', 'cache_version')), [(98, 0), (99, 0)]
+        )
+
+    def test_review_author_rename_shows_up_despite_cached_review(self):
+        Review.objects.create(movie=self.movie, user=self.user, comment='Good')
+        url = reverse('movies.show', args=[self.movie.id])
+        self.client.get(url)
+        User.objects.filter(id=self.user.id).update(username='renamed')
+        self.assertContains(self.client.get(url), 'Review by renamed')
+
+    def test_user_specific_parts_are_rendered_per_request(self):
+        other = User.objects.create_user(username='other', password='password')
+        Rating.objects.create(movie=self.movie, user=self.user, value=4)
+        Review.objects.create(movie=self.movie, user=self.user, comment='Good')
+        url = reverse('movies.show', args=[self.movie.id])
+
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertContains(response, 'Remove my rating')
+        self.assertContains(response, '>Edit</a>')
+
+        self.client.force_login(other)
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Remove my rating')
+        self.assertNotContains(response, '>Edit</a>')
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        cache.clear()
+
+    def upload(self, name, size, mode='RGB', image_format='JPEG'):
+        output = io.BytesIO()
+        Image.new(mode, size).save(output, image_format)
+        return SimpleUploadedFile(name, output.getvalue())
+
+    def test_upload_creates_resized_and_webp_variants(self):
+        movie = Movie.objects.create(
+            name='Poster', price=10, description='', image=self.upload('poster.jpg', (500, 750))
+        )
+        storage = movie.image.storage
+        for width in (160, 320):
+            for extension in ('webp', 'jpg'):
+                self.assertTrue(storage.exists(derivative_name(movie.image.name, width, extension)))
+        self.assertFalse(storage.exists(derivative_name(movie.image.name, 640, 'webp')))
+        with storage.open(derivative_name(movie.image.name, 160, 'webp')) as variant:
+            self.assertEqual(Image.open(variant).size, (160, 240))
+
+        response = self.client.get(reverse('movies.index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'poster-320w.webp 320w')
+        self.assertContains(response, 'poster-160w.jpg 160w')
+
+    def test_saving_again_does_not_decode_the_original(self):
+        movie = Movie.objects.create(
+            name='Poster', price=10, description='', image=self.upload('poster.jpg', (500, 750))
+        )
+        with mock.patch('movies.images.ImageOps.exif_transpose') as decode:
+            movie.price = 12
+            movie.save()
+        decode.assert_not_called()
+
+        movie.image.storage.delete(derivative_name(movie.image.name, 160, 'jpg'))
+        movie.save()
+        self.assertTrue(movie.image.storage.exists(derivative_name(movie.image.name, 160, 'jpg')))
+
+    def test_png_variants_stay_png(self):
+        movie = Movie.objects.create(
+            name='Logo', price=10, description='',
+            image=self.upload('logo.png', (400, 400), mode='RGBA', image_format='PNG'),
+        )
+        self.assertTrue(movie.image.storage.exists(derivative_name(movie.image.name, 320, 'png')))
+
+    def test_missing_variants_fall_back_to_the_original(self):
+        movie = Movie.objects.create(name='Missing', price=10, description='', image='movie_images/missing.jpg')
+        response = self.client.get(reverse('movies.show', args=[movie.id]))
+        self.assertContains(response, f'src="{movie.image.url}"')
+        self.assertNotContains(response, 'srcset')
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movies = [
+            Movie.objects.create(name=f'Movie {i}', price=10, description='', image='movie_images/test.jpg')
+            for i in range(4)
+        ]
+        cls.users = [User.objects.create_user(username=f'fan{i}') for i in range(3)]
+
+    def buy(self, user, *movies):
+        order = Order.objects.create(user=user, total=10 * len(movies))
+        Item.objects.bulk_create(Item(order=order, movie=movie, price=10, quantity=1) for movie in movies)
+
+    def test_builds_ranked_neighbors_from_purchases_and_ratings(self):
+        first, second, third, unrelated = self.movies
+        for user in self.users:
+            self.buy(user, first, second)
+        Rating.objects.create(movie=first, user=self.users[0], value=5)
+        Rating.objects.create(movie=third, user=self.users[0], value=2)
+
+        self.assertEqual(build_recommendations(top_k=2), 6)
+        neighbors = list(
+            MovieNeighbor.objects.filter(movie=first).order_by('rank').values_list('neighbor_id', flat=True)
+        )
+        self.assertEqual(neighbors, [second.id, third.id])
+        self.assertFalse(MovieNeighbor.objects.filter(movie=unrelated).exists())
+        self.assertFalse(MovieNeighbor.objects.filter(neighbor=unrelated).exists())
+
+    def test_movie_page_reads_recommendations_in_one_query(self):
+        first, second, third, _ = self.movies
+        MovieNeighbor.objects.create(movie=first, neighbor=third, rank=2, score=0.5)
+        MovieNeighbor.objects.create(movie=first, neighbor=second, rank=1, score=0.9)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('movies.show', args=[first.id]))
+        self.assertEqual(response.context['template_data']['recommendations'], [second, third])
+        self.assertContains(response, 'also liked')
+        neighbor_queries = [query for query in queries.captured_queries if 'movieneighbor' in query['sql']]
+        self.assertEqual(len(neighbor_queries), 1)
+
+
+class RequestVotingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='voter', password='password')
+        cls.requests = [
+            MovieRequest.objects.create(name=f'Request {i}', description='', user=cls.user)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def vote(self, movie_request):
+        self.client.post(reverse('movies.request_vote', args=[movie_request.id]))
+        movie_request.refresh_from_db()
+        return movie_request.vote_count
+
+    def test_vote_toggles_counter(self):
+        movie_request = self.requests[0]
+        self.assertEqual(self.vote(movie_request), 1)
+        self.assertEqual(self.vote(movie_request), 0)
+        self.assertFalse(MovieRequestVote.objects.exists())
+
+    def test_admin_edit_keeps_votes_cast_meanwhile(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        movie_request = self.requests[0]
+        url = reverse('admin:movies_movierequest_change', args=[movie_request.id])
+        self.assertNotIn('vote_count', self.client.get(url).context['adminform'].form.fields)
+        MovieRequest.objects.filter(id=movie_request.id).update(vote_count=F('vote_count') + 2)
+        data = {'name': 'Renamed', 'description': 'Please', 'user': self.user.id, 'vote_count': 0}
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        movie_request.refresh_from_db()
+        self.assertEqual((movie_request.name, movie_request.vote_count), ('Renamed', 2))
+
+    def test_votes_are_read_only_in_the_admin(self):
+        self.vote(self.requests[0])
+        vote = MovieRequestVote.objects.get()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.assertEqual(self.client.get(reverse('admin:movies_movierequestvote_add')).status_code, 403)
+        self.client.post(reverse('admin:movies_movierequestvote_delete', args=[vote.id]), {'post': 'yes'})
+        self.assertTrue(MovieRequestVote.objects.exists())
+
+    def test_database_rejects_duplicate_votes(self):
+        MovieRequestVote.objects.create(request=self.requests[0], user=self.user)
+        with self.assertRaises(IntegrityError):
+            MovieRequestVote.objects.create(request=self.requests[0], user=self.user)
+
+    def test_ranking_is_ordered_by_votes_and_paginated(self):
+        voters = [User.objects.create_user(username=f'voter{i}') for i in range(2)]
+        for voter in voters:
+            MovieRequestVote.objects.create(request=self.requests[2], user=voter)
+        MovieRequest.objects.filter(id=self.requests[2].id).update(vote_count=2)
+        self.vote(self.requests[1])
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('movies.requests_all'), {'per_page': 2})
+        template_data = response.context['template_data']
+        self.assertEqual(
+            [movie_request.id for movie_request in template_data['requests']],
+            [self.requests[2].id, self.requests[1].id],
+        )
+        self.assertEqual(template_data['voted_ids'], {self.requests[1].id})
+        self.assertTrue(template_data['page'].has_next)
+
+
+class ConcurrentVoteTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='voter', password='password')
+        self.movie_request = MovieRequest.objects.create(name='Request', description='', user=self.user)
+
+    def test_parallel_clicks_never_duplicate_votes(self):
+        clients = []
+        for _ in range(8):
+            client = Client()
+            client.force_login(self.user)
+            clients.append(client)
+
+        barrier = threading.Barrier(len(clients))
+        errors = []
+
+        def click(client):
+            try:
+                barrier.wait()
+                client.post(reverse('movies.request_vote', args=[self.movie_request.id]))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=click, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        votes = MovieRequestVote.objects.filter(request=self.movie_request).count()
+        self.assertLessEqual(votes, 1)
+        self.movie_request.refresh_from_db()
+        self.assertEqual(self.movie_request.vote_count, votes)
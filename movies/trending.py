@@ -0,0 +1,69 @@
+import datetime
+import math
+
+from django.conf import settings
+
+
+def decay_rate():
+    """Decay constant per second for TRENDING_HALF_LIFE_HOURS."""
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def bucket_hour(when):
+    """Start of the hourly sales bucket ``when`` falls into."""
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def trend_weight(quantity, when):
+    """Log-space weight of ``quantity`` copies bought at ``when``.
+
+    A decayed count ``sum(q * exp(-rate * (now - t)))`` changes every second,
+    so it is stored as ``log(sum(q * exp(rate * t)))`` instead. Adding a
+    purchase never rewrites the older terms, the order between two scores
+    never changes as time passes (so the column can be indexed and ranked
+    on), and ``trend_score`` turns it back into a count for any moment.
+    """
+    return math.log(quantity) + decay_rate() * when.timestamp()
+
+
+def add_trend(trend_log, weight):
+    """Add a ``trend_weight`` to a stored ``trend_log`` (which may be None)."""
+    if trend_log is None:
+        return weight
+    high, low = max(trend_log, weight), min(trend_log, weight)
+    return high + math.log1p(math.exp(low - high))
+
+
+def trend_score(trend_log, now):
+    """Decayed purchase count at ``now`` for a stored ``trend_log``."""
+    return math.exp(trend_log - decay_rate() * now.timestamp())
+
+
+def aggregate_history(rows):
+    """Fold ``(region_id, movie_id, date, quantity, price)`` item rows into trend data.
+
+    Returns ``(sales, trends, buckets)``: ``sales`` maps ``(region_id,
+    movie_id)`` to ``[quantity, revenue, trend_log]``, ``trends`` maps
+    ``movie_id`` to the store-wide trend_log and ``buckets`` maps
+    ``(region_id, movie_id, hour)`` to the quantity sold that hour.
+    """
+    sales = {}
+    trends = {}
+    buckets = {}
+    for region_id, movie_id, date, quantity, price in rows:
+        if quantity <= 0:
+            continue
+        weight = trend_weight(quantity, date)
+        totals = sales.setdefault((region_id, movie_id), [0, 0, None])
+        totals[0] += quantity
+        totals[1] += price * quantity
+        totals[2] = add_trend(totals[2], weight)
+        trends[movie_id] = add_trend(trends.get(movie_id), weight)
+        key = (region_id, movie_id, bucket_hour(date))
+        buckets[key] = buckets.get(key, 0) + quantity
+    return sales, trends, buckets
+
+
+def window_start(hours, now):
+    """First bucket hour of the ``hours`` most recent buckets, the current one included."""
+    return bucket_hour(now) - datetime.timedelta(hours=hours - 1)
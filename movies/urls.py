@@ -3,7 +3,9 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='movies.index'),
+    path('autocomplete/', views.autocomplete, name='movies.autocomplete'),
     path('map/', views.popularity_map, name='movies.popularity_map'),
+    path('map/data.json', views.popularity_map_data, name='movies.popularity_map_data'),
     path('<int:id>/', views.show, name='movies.show'),
     path('<int:id>/rating/', views.rate_movie, name='movies.rate'),
     path('<int:id>/review/create/', views.create_review, name='movies.create_review'),
@@ -0,0 +1,339 @@
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Max, Sum, Window
+from django.db.models.functions import Coalesce
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Movie, MovieSalesBucket, MovieTrend, Region, RegionMovieSales
+from .trending import add_trend, aggregate_history, bucket_hour, trend_score, trend_weight, window_start
+
+POPULARITY_MAP_CACHE_KEY = 'movies:popularity_map_payload'
+
+
+def _merge_rows(queryset, key, new_rows, merge, fields):
+    """Fold ``new_rows`` into the matching rows of ``queryset`` and insert the rest.
+
+    Matching rows are locked and written back with one bulk UPDATE; the rest
+    go in with one bulk INSERT. If a concurrent checkout inserts one of them
+    first, re-read the locked rows and merge into those one by one instead.
+    ``merge(row, new_row)`` adds ``new_row`` onto ``row`` in place.
+    """
+    existing = {key(row): row for row in queryset.select_for_update()}
+    missing = []
+    for new_row in new_rows:
+        row = existing.get(key(new_row))
+        if row is None:
+            missing.append(new_row)
+        else:
+            merge(row, new_row)
+    queryset.model.objects.bulk_update(existing.values(), fields)
+    try:
+        with transaction.atomic():
+            queryset.model.objects.bulk_create(missing)
+    except IntegrityError:
+        existing = {key(row): row for row in queryset.select_for_update()}
+        for new_row in missing:
+            row = existing.get(key(new_row))
+            if row is None:
+                new_row.save()
+            else:
+                merge(row, new_row)
+                row.save(update_fields=fields)
+
+
+def _merge_sales(sales, new_sales):
+    sales.total_quantity += new_sales.total_quantity
+    sales.revenue += new_sales.revenue
+    sales.trend_log = add_trend(sales.trend_log, new_sales.trend_log)
+
+
+def _merge_trend(trend, new_trend):
+    trend.trend_log = add_trend(trend.trend_log, new_trend.trend_log)
+
+
+def _merge_bucket(bucket, new_bucket):
+    bucket.quantity += new_bucket.quantity
+
+
+def record_region_sales(region, items, when=None):
+    """Add a new order's items to the sales rollup, trend scores and hourly buckets.
+
+    Updates the region's RegionMovieSales rows (totals and decayed score), the
+    store-wide MovieTrend rows and the MovieSalesBucket rows for the hour of
+    ``when`` (default: now) in one transaction, with one bulk UPDATE and one
+    bulk INSERT per table.
+    """
+    if when is None:
+        when = timezone.now()
+    totals = {}
+    for item in items:
+        quantity, revenue = totals.get(item.movie_id, (0, 0))
+        item_quantity = int(item.quantity)
+        totals[item.movie_id] = (quantity + item_quantity, revenue + item.price * item_quantity)
+    weights = {movie_id: trend_weight(quantity, when) for movie_id, (quantity, _) in totals.items()}
+    hour = bucket_hour(when)
+
+    with transaction.atomic():
+        _merge_rows(
+            RegionMovieSales.objects.filter(region=region, movie_id__in=totals),
+            lambda sales: sales.movie_id,
+            [
+                RegionMovieSales(
+                    region=region,
+                    movie_id=movie_id,
+                    total_quantity=quantity,
+                    revenue=revenue,
+                    trend_log=weights[movie_id],
+                )
+                for movie_id, (quantity, revenue) in totals.items()
+            ],
+            _merge_sales,
+            ['total_quantity', 'revenue', 'trend_log'],
+        )
+        _merge_rows(
+            MovieTrend.objects.filter(movie_id__in=totals),
+            lambda trend: trend.movie_id,
+            [MovieTrend(movie_id=movie_id, trend_log=weight) for movie_id, weight in weights.items()],
+            _merge_trend,
+            ['trend_log'],
+        )
+        _merge_rows(
+            MovieSalesBucket.objects.filter(region=region, hour=hour, movie_id__in=totals),
+            lambda bucket: bucket.movie_id,
+            [
+                MovieSalesBucket(region=region, movie_id=movie_id, hour=hour, quantity=quantity)
+                for movie_id, (quantity, _) in totals.items()
+            ],
+            _merge_bucket,
+            ['quantity'],
+        )
+
+
+def rebuild_region_sales():
+    """Recompute the rollup, trend scores and buckets from the order history.
+
+    Returns the number of rollup rows.
+    """
+    from cart.models import Item
+
+    rows = Item.objects.values_list('order__region_id', 'movie_id', 'order__date', 'quantity', 'price').order_by()
+    sales, trends, buckets = aggregate_history(rows.iterator(chunk_size=2000))
+    with transaction.atomic():
+        RegionMovieSales.objects.all().delete()
+        MovieTrend.objects.all().delete()
+        MovieSalesBucket.objects.all().delete()
+        RegionMovieSales.objects.bulk_create(
+            (
+                RegionMovieSales(
+                    region_id=region_id,
+                    movie_id=movie_id,
+                    total_quantity=quantity,
+                    revenue=revenue,
+                    trend_log=trend_log,
+                )
+                for (region_id, movie_id), (quantity, revenue, trend_log) in sales.items()
+            ),
+            batch_size=500,
+        )
+        MovieTrend.objects.bulk_create(
+            (MovieTrend(movie_id=movie_id, trend_log=trend_log) for movie_id, trend_log in trends.items()),
+            batch_size=500,
+        )
+        MovieSalesBucket.objects.bulk_create(
+            (
+                MovieSalesBucket(region_id=region_id, movie_id=movie_id, hour=hour, quantity=quantity)
+                for (region_id, movie_id, hour), quantity in buckets.items()
+            ),
+            batch_size=500,
+        )
+    return len(sales)
+
+
+def reconcile_rating_aggregates(fix=True, batch_size=500):
+    """Compare Movie.rating_sum/rating_count with the Rating rows.
+
+    Returns a list of ``(movie, actual_sum, actual_count)`` for every movie
+    whose stored aggregates drifted; those rows are corrected when ``fix``.
+    """
+    movies = Movie.objects.annotate(
+        actual_sum=Coalesce(Sum('ratings__value'), 0),
+        actual_count=Count('ratings'),
+    ).only('id', 'name', 'rating_sum', 'rating_count').order_by('id')
+
+    drifted = []
+    for movie in movies.iterator(chunk_size=batch_size):
+        if movie.rating_sum != movie.actual_sum or movie.rating_count != movie.actual_count:
+            drifted.append((movie, movie.actual_sum, movie.actual_count))
+
+    if fix and drifted:
+        updates = []
+        for movie, actual_sum, actual_count in drifted:
+            # bulk_update sends no signals, so bump the fragment cache version here.
+            updates.append(
+                Movie(
+                    id=movie.id,
+                    rating_sum=actual_sum,
+                    rating_count=actual_count,
+                    cache_version=F('cache_version') + 1,
+                )
+            )
+        Movie.objects.bulk_update(updates, ['rating_sum', 'rating_count', 'cache_version'], batch_size=batch_size)
+    return drifted
+
+
+def top_movies_per_region(limit=None):
+    """Return {region_id: [top movies]} from the rollup in a single query.
+
+    Uses ROW_NUMBER() OVER (PARTITION BY region ...) so only the top ``limit``
+    rows per region leave the database; on SQLite builds without window
+    functions every row is fetched in rank order and trimmed here instead.
+    """
+    if limit is None:
+        limit = settings.POPULARITY_MAP_TOP_N
+    rows = (
+        RegionMovieSales.objects.filter(total_quantity__gt=0)
+        .values('region_id', 'movie_id', 'total_quantity')
+        .annotate(title=F('movie__name'))
+    )
+    if connection.features.supports_over_clause:
+        rows = rows.annotate(
+            rank=Window(
+                RowNumber(),
+                partition_by=F('region_id'),
+                order_by=[F('total_quantity').desc(), F('movie_id').asc()],
+            )
+        ).filter(rank__lte=limit)
+
+    by_region = {}
+    for row in rows.order_by('region_id', '-total_quantity', 'movie_id'):
+        top_movies = by_region.setdefault(row['region_id'], [])
+        if len(top_movies) < limit:
+            top_movies.append(
+                {
+                    'movie_id': row['movie_id'],
+                    'title': row['title'],
+                    'total': row['total_quantity'],
+                }
+            )
+    return by_region
+
+
+def trending_movies(limit=None, region=None, now=None):
+    """Return the movies with the highest decayed purchase counts.
+
+    Store-wide by default, or within ``region``. Ranking reads the indexed
+    ``trend_log`` columns, so it never scans the order history; ``total`` is
+    the number of copies sold in the last TRENDING_WINDOW_HOURS hours.
+    """
+    if limit is None:
+        limit = settings.POPULARITY_MAP_TOP_N
+    if now is None:
+        now = timezone.now()
+    if region is None:
+        rows = MovieTrend.objects.all()
+    else:
+        rows = RegionMovieSales.objects.filter(region=region, trend_log__isnull=False)
+    rows = list(
+        rows.values('movie_id', 'trend_log')
+        .annotate(title=F('movie__name'))
+        .order_by('-trend_log', 'movie_id')[:limit]
+    )
+    recent = windowed_sales(
+        settings.TRENDING_WINDOW_HOURS,
+        region=region,
+        movie_ids=[row['movie_id'] for row in rows],
+        now=now,
+    )
+    recent_totals = {row['movie_id']: row['total'] for row in recent}
+    return [
+        {
+            'movie_id': row['movie_id'],
+            'title': row['title'],
+            'score': round(trend_score(row['trend_log'], now), 2),
+            'total': recent_totals.get(row['movie_id'], 0),
+        }
+        for row in rows
+    ]
+
+
+def windowed_sales(hours, region=None, limit=None, movie_ids=None, now=None):
+    """Return the best sellers of the last ``hours`` hourly buckets, current hour included.
+
+    Store-wide by default, or within ``region``; ``movie_ids`` restricts the
+    result to those movies. Only the buckets inside the window are read.
+    """
+    if now is None:
+        now = timezone.now()
+    buckets = MovieSalesBucket.objects.filter(hour__gte=window_start(hours, now))
+    if region is not None:
+        buckets = buckets.filter(region=region)
+    if movie_ids is not None:
+        buckets = buckets.filter(movie_id__in=movie_ids)
+    rows = (
+        buckets.values('movie_id')
+        .annotate(title=F('movie__name'), total=Sum('quantity'))
+        .order_by('-total', 'movie_id')
+    )
+    if limit is not None:
+        rows = rows[:limit]
+    return list(rows)
+
+
+def _popularity_map_cache_key(latest_order_id):
+    return f'{POPULARITY_MAP_CACHE_KEY}:{latest_order_id or 0}'
+
+
+async def _alatest_order_id():
+    from cart.models import Order
+
+    return (await Order.objects.aaggregate(latest=Max('id')))['latest']
+
+
+def _build_popularity_map_payload(cache_key):
+    top_by_region = top_movies_per_region()
+    region_payload = []
+    for region in Region.objects.all():
+        top_movies = top_by_region.get(region.id, [])
+        region_payload.append(
+            {
+                'id': region.id,
+                'name': region.name,
+                'code': region.code,
+                'center_lat': region.center_lat,
+                'center_lng': region.center_lng,
+                'top_movies': top_movies,
+                'total_purchases': sum(row['total'] for row in top_movies),
+            }
+        )
+    payload = {
+        'regions': region_payload,
+        'global_trending': trending_movies(),
+    }
+    body = json.dumps(payload, cls=DjangoJSONEncoder)
+    cached = (hashlib.md5(body.encode()).hexdigest(), body)
+    cache.set(cache_key, cached, 300)
+    return cached
+
+
+async def apopularity_map_payload():
+    """Return ``(etag, body)`` for the map's region and global trending data.
+
+    The serialized payload is cached under the id of the latest Order, so a
+    new order in any worker moves every worker to a fresh key; the cache only
+    has to hold it for five minutes to pick up region edits and rebuilds. The
+    aggregation runs once per new order instead of once per page view, and
+    only a cache miss leaves the event loop for a thread.
+    """
+    cache_key = _popularity_map_cache_key(await _alatest_order_id())
+    cached = await cache.aget(cache_key)
+    if cached is None:
+        cached = await sync_to_async(_build_popularity_map_payload)(cache_key)
+    return cached
+
@@ -1,47 +1,82 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
 from django.utils.timezone import localtime
 
-from .models import Movie, Review, Rating, Region, MovieRequest, MovieRequestVote
+from .models import Movie, MovieNeighbor, Review, Rating, Region, MovieRequest, MovieRequestVote
+from .autocomplete import movie_name_index
+from .pagination import apaginate_request, paginate_request
+from .search import get_search_backend
+from .utils import apopularity_map_payload
 from cart.models import Item
+from moviesstore.routers import pin_to_primary, use_replica
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Avg, Sum, F
-
-def index(request):
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.views.decorators.cache import cache_control
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+async def load_user(request):
+    """Resolve the user without blocking, for the templates of async views.
+
+    Context processors read ``request.user`` synchronously, so the resolved
+    user replaces the lazy object before rendering.
+    """
+    request.user = await request.auser()
+    return request.user
+
+@use_replica
+async def index(request):
+    await load_user(request)
     search_term = request.GET.get('search')
     if search_term:
-        movies = Movie.objects.filter(name__icontains=search_term)
+        movies, ordering = get_search_backend().search(Movie.objects.all(), search_term)
     else:
-        movies = Movie.objects.all()
+        movies, ordering = Movie.objects.all(), ['name', 'id']
 
-    movies = movies.annotate(
-        avg_rating=Avg('ratings__value'),
-        rating_count=Count('ratings')
-    )
+    page = await apaginate_request(request, movies, ordering, settings.CATALOG_PAGE_SIZE)
     template_data = {}
     template_data['title'] = 'Movies'
-    template_data['movies'] = movies
+    template_data['movies'] = page.object_list
+    template_data['page'] = page
+    template_data['search_term'] = search_term or ''
+    template_data['fragment_cache_timeout'] = settings.MOVIE_FRAGMENT_CACHE_TIMEOUT
     return render(request, 'movies/index.html', {'template_data': template_data})
 
-def show(request, id):
-    movie = Movie.objects.get(id=id)
-    reviews = Review.objects.filter(movie=movie)
-    rating_data = movie.ratings.aggregate(
-        average=Avg('value'),
-        total=Count('id')
-    )
+@use_replica
+def autocomplete(request):
+    suggestions = movie_name_index.suggest(request.GET.get('q', ''))
+    return JsonResponse({'results': suggestions})
+
+@use_replica
+async def show(request, id):
+    user = await load_user(request)
+    movie = await aget_object_or_404(Movie, id=id)
+    reviews = Review.objects.filter(movie=movie).select_related('user')
+    page = await apaginate_request(request, reviews, ['-date', '-id'], settings.REVIEWS_PAGE_SIZE)
+    recommendations = [
+        neighbor.neighbor
+        async for neighbor in MovieNeighbor.objects.filter(movie_id=movie.id)
+        .select_related('neighbor')
+        .order_by('rank')[:settings.RECOMMENDATIONS_SHOWN]
+    ]
     user_rating_value = None
-    if request.user.is_authenticated:
-        user_rating = movie.ratings.filter(user=request.user).first()
+    if user.is_authenticated:
+        user_rating = await movie.ratings.filter(user=user).afirst()
         if user_rating:
             user_rating_value = user_rating.value
     template_data = {}
     template_data['title'] = movie.name
     template_data['movie'] = movie
-    template_data['reviews'] = reviews
-    template_data['average_rating'] = rating_data['average']
-    template_data['rating_count'] = rating_data['total']
+    template_data['reviews'] = page.object_list
+    template_data['reviews_page'] = page
+    template_data['recommendations'] = recommendations
+    template_data['average_rating'] = movie.average_rating
+    template_data['rating_count'] = movie.rating_count
     template_data['user_rating'] = user_rating_value
     template_data['rating_choices'] = [1, 2, 3, 4, 5]
+    template_data['fragment_cache_timeout'] = settings.MOVIE_FRAGMENT_CACHE_TIMEOUT
     return render(request, 'movies/show.html', {'template_data': template_data})
 
 @login_required
@@ -53,6 +88,7 @@ def create_review(request, id):
         review.movie = movie
         review.user = request.user
         review.save()
+        pin_to_primary(request)
         return redirect('movies.show', id=id)
     else:
         return redirect('movies.show', id=id)
@@ -72,6 +108,7 @@ def edit_review(request, id, review_id):
         review = Review.objects.get(id=review_id)
         review.comment = request.POST['comment']
         review.save()
+        pin_to_primary(request)
         return redirect('movies.show', id=id)
     else:
         return redirect('movies.show', id=id)
@@ -80,6 +117,7 @@ def edit_review(request, id, review_id):
 def delete_review(request, id, review_id):
     review = get_object_or_404(Review, id=review_id, user=request.user)
     review.delete()
+    pin_to_primary(request)
     return redirect('movies.show', id=id)
 
 @login_required
@@ -91,7 +129,15 @@ def rate_movie(request, id):
     action = request.POST.get('action', 'set')
 
     if action == 'clear':
-        Rating.objects.filter(movie=movie, user=request.user).delete()
+        with transaction.atomic():
+            rating = Rating.objects.select_for_update().filter(movie=movie, user=request.user).first()
+            if rating:
+                rating.delete()
+                Movie.objects.filter(id=movie.id).update(
+                    rating_sum=F('rating_sum') - rating.value,
+                    rating_count=F('rating_count') - 1,
+                )
+        pin_to_primary(request)
         return redirect('movies.show', id=id)
 
     rating_value = request.POST.get('rating')
@@ -104,62 +150,30 @@ def rate_movie(request, id):
     if rating_value < 1 or rating_value > 5:
         return redirect('movies.show', id=id)
 
-    Rating.objects.update_or_create(
-        movie=movie,
-        user=request.user,
-        defaults={'value': rating_value}
-    )
-
+    with transaction.atomic():
+        rating = Rating.objects.select_for_update().filter(movie=movie, user=request.user).first()
+        if rating:
+            previous_value = rating.value
+            rating.value = rating_value
+            rating.save(update_fields=['value', 'updated_at'])
+            Movie.objects.filter(id=movie.id).update(
+                rating_sum=F('rating_sum') + rating_value - previous_value,
+            )
+        else:
+            Rating.objects.create(movie=movie, user=request.user, value=rating_value)
+            Movie.objects.filter(id=movie.id).update(
+                rating_sum=F('rating_sum') + rating_value,
+                rating_count=F('rating_count') + 1,
+            )
+
+    pin_to_primary(request)
     return redirect('movies.show', id=id)
 
-
 @login_required
+@use_replica
 def popularity_map(request):
     regions = Region.objects.all()
 
-    region_payload = []
-    for region in regions:
-        top_movies_qs = (
-            Item.objects.filter(order__region=region)
-            .values('movie_id')
-            .annotate(title=F('movie__name'), total=Sum('quantity'))
-            .order_by('-total')
-        )
-        top_movies = [
-            {
-                'movie_id': row['movie_id'],
-                'title': row['title'],
-                'total': row['total'],
-            }
-            for row in top_movies_qs[:5]
-        ]
-        total_purchases = sum(row['total'] for row in top_movies)
-        region_payload.append(
-            {
-                'id': region.id,
-                'name': region.name,
-                'code': region.code,
-                'center_lat': region.center_lat,
-                'center_lng': region.center_lng,
-                'top_movies': top_movies,
-                'total_purchases': total_purchases,
-            }
-        )
-
-    global_trending_qs = (
-        Item.objects.values('movie_id')
-        .annotate(title=F('movie__name'), total=Sum('quantity'))
-        .order_by('-total')[:5]
-    )
-    global_trending = [
-        {
-            'movie_id': row['movie_id'],
-            'title': row['title'],
-            'total': row['total'],
-        }
-        for row in global_trending_qs
-    ]
-
     user_purchase_history = []
     user_items = (
         Item.objects.filter(order__user=request.user)
@@ -187,14 +201,26 @@ def popularity_map(request):
     template_data = {
         'title': 'Local Popularity Map',
         'regions': regions,
-        'global_trending': global_trending,
-        'region_payload': region_payload,
         'user_purchase_history': user_purchase_history,
         'user_region_code': user_region,
+        'trending_window_hours': settings.TRENDING_WINDOW_HOURS,
     }
 
     return render(request, 'movies/popularity_map.html', {'template_data': template_data})
 
+@use_replica
+@cache_control(public=True, max_age=60)
+async def popularity_map_data(request):
+    # @etag calls its function synchronously, so the conditional GET is
+    # handled here, after the payload has been fetched without blocking.
+    payload_etag, body = await apopularity_map_payload()
+    payload_etag = quote_etag(payload_etag)
+    response = get_conditional_response(request, etag=payload_etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response.headers['ETag'] = payload_etag
+    return response
+
 @login_required
 def requests_page(request):
     template_data = { 'title': 'Movie Requests' }
@@ -209,12 +235,14 @@ def requests_page(request):
                     description=description,
                     user=request.user
                 )
+                pin_to_primary(request)
             return redirect('movies.requests')
         elif action == 'delete':
             req_id = request.POST.get('request_id')
             if req_id:
                 movie_request = get_object_or_404(MovieRequest, id=req_id, user=request.user)
                 movie_request.delete()
+                pin_to_primary(request)
             return redirect('movies.requests')
 
     # GET (or fallthrough): list current user's requests
@@ -223,16 +251,20 @@ def requests_page(request):
     return render(request, 'movies/requests.html', { 'template_data': template_data })
 
 @login_required
+@use_replica
 def requests_all_page(request):
     template_data = { 'title': 'Movie Requests Voting' }
 
-    requests = MovieRequest.objects.annotate(
-        total_votes=Count("votes")
-    ).order_by("-total_votes")
+    requests = MovieRequest.objects.select_related('user')
+    page = paginate_request(request, requests, ['-vote_count', '-id'], settings.REQUESTS_PAGE_SIZE)
 
-    voted_ids = MovieRequestVote.objects.filter(user=request.user).values_list("request_id", flat=True)
+    voted_ids = set(
+        MovieRequestVote.objects.filter(user=request.user, request__in=page.object_list)
+        .values_list("request_id", flat=True)
+    )
 
-    template_data['requests'] = requests
+    template_data['requests'] = page.object_list
+    template_data['page'] = page
     template_data['voted_ids'] = voted_ids
 
     return render(request, 'movies/requests_all.html', { 'template_data': template_data })
@@ -243,11 +275,22 @@ def request_vote(request, id):
         return redirect("movies.requests_all")
 
     movie_request = get_object_or_404(MovieRequest, id=id)
-    existing_user_vote = MovieRequestVote.objects.filter(request=movie_request, user=request.user)
-
-    if existing_user_vote:
-        existing_user_vote.delete()
-    else:
-        MovieRequestVote.objects.create(request=movie_request, user=request.user)
 
+    # Toggle with one write: delete the vote, and only if there was none
+    # insert it. The unique constraint turns a concurrent duplicate insert
+    # into an IntegrityError, so the counter only moves for a real change.
+    with transaction.atomic():
+        deleted, _ = MovieRequestVote.objects.filter(request=movie_request, user=request.user).delete()
+        if deleted:
+            MovieRequest.objects.filter(id=movie_request.id).update(vote_count=F('vote_count') - deleted)
+        else:
+            try:
+                with transaction.atomic():
+                    MovieRequestVote.objects.create(request=movie_request, user=request.user)
+            except IntegrityError:
+                pass
+            else:
+                MovieRequest.objects.filter(id=movie_request.id).update(vote_count=F('vote_count') + 1)
+
+    pin_to_primary(request)
     return redirect("movies.requests_all")
@@ -13,4 +13,7 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'moviesstore.settings')
 
+# Unlike wsgi.py, static and media files are not served here when
+# SERVE_STATIC_FILES is on (StaticMediaHandler only speaks WSGI); put the web
+# server or a CDN in front of /static/ and /media/ instead.
 application = get_asgi_application()
@@ -0,0 +1,182 @@
+import csv
+import datetime
+import json
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.http import require_GET
+
+from cart.models import Item, Order
+from movies.models import Rating, Review
+from movies.pagination import CursorEncoder
+
+# Each dataset: (model, date field the range filters on, {column: lookup}).
+DATASETS = {
+    'orders': (
+        Order,
+        'date',
+        {
+            'id': 'id',
+            'date': 'date',
+            'user_id': 'user_id',
+            'username': 'user__username',
+            'region': 'region__code',
+            'total': 'total',
+        },
+    ),
+    'items': (
+        Item,
+        'order__date',
+        {
+            'id': 'id',
+            'order_id': 'order_id',
+            'date': 'order__date',
+            'user_id': 'order__user_id',
+            'region': 'order__region__code',
+            'movie_id': 'movie_id',
+            'movie': 'movie__name',
+            'price': 'price',
+            'quantity': 'quantity',
+        },
+    ),
+    'ratings': (
+        Rating,
+        'created_at',
+        {
+            'id': 'id',
+            'movie_id': 'movie_id',
+            'user_id': 'user_id',
+            'value': 'value',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+    ),
+    'reviews': (
+        Review,
+        'date',
+        {
+            'id': 'id',
+            'movie_id': 'movie_id',
+            'user_id': 'user_id',
+            'date': 'date',
+            'comment': 'comment',
+        },
+    ),
+}
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+
+def parse_bound(value, end=False):
+    """Turn a ``start``/``end`` filter into an aware datetime, or None if empty.
+
+    A bare date covers that whole day, so ``end=2024-05-31`` includes orders
+    placed on the 31st. Raises ValueError for anything unparseable.
+    """
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is not None:
+        if end:
+            day += datetime.timedelta(days=1)
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f'Invalid date: {value!r}. Use YYYY-MM-DD or an ISO 8601 datetime.')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+# Both formats write dates through the same encoder, so a timestamp reads
+# identically in CSV and JSON Lines (ISO 8601 with microseconds).
+_encoder = CursorEncoder()
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return _encoder.default(value)
+    return value
+
+
+def export_rows(dataset, fmt='csv', start=None, end=None, chunk_size=None):
+    """Yield ``dataset`` as CSV or JSON Lines text, ``chunk_size`` rows at a time.
+
+    Rows are read in primary key order with ``.iterator()``, so memory use
+    stays the same however large the table is. ``start`` is inclusive and
+    ``end`` exclusive. Raises KeyError for an unknown dataset or format.
+    """
+    model, date_field, columns = DATASETS[dataset]
+    if fmt not in FORMATS:
+        raise KeyError(fmt)
+    if chunk_size is None:
+        chunk_size = settings.EXPORT_CHUNK_SIZE
+    queryset = model.objects.all()
+    if start is not None:
+        queryset = queryset.filter(**{f'{date_field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{date_field}__lt': end})
+    rows = queryset.order_by('pk').values_list(*columns.values()).iterator(chunk_size=chunk_size)
+
+    headers = list(columns)
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(headers)
+
+        def encode(row):
+            return writer.writerow([_csv_value(value) for value in row])
+    else:
+
+        def encode(row):
+            return json.dumps(dict(zip(headers, row)), cls=CursorEncoder) + '\n'
+
+    lines = []
+    for row in rows:
+        lines.append(encode(row))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+@staff_member_required
+@require_GET
+def export_view(request, dataset):
+    """Stream a dataset to staff as ``?format=csv|jsonl&start=...&end=...``."""
+    if dataset not in DATASETS:
+        raise Http404(f'Unknown export {dataset!r}.')
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return HttpResponseBadRequest(
+            f'Unknown format {fmt!r}; use one of: {", ".join(FORMATS)}.', content_type='text/plain'
+        )
+    try:
+        start = parse_bound(request.GET.get('start'))
+        end = parse_bound(request.GET.get('end'), end=True)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error), content_type='text/plain')
+
+    content_type, extension = FORMATS[fmt]
+    response = StreamingHttpResponse(
+        export_rows(dataset, fmt, start, end),
+        content_type=f'{content_type}; charset=utf-8',
+    )
+    filename = f'{dataset}-{timezone.now():%Y%m%d-%H%M%S}.{extension}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'private, no-store'
+    return response
@@ -0,0 +1,85 @@
+import functools
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+
+REPLICA_APP_LABELS = {'movies'}
+PRIMARY_PIN_SESSION_KEY = 'primary_until'
+
+_read_database = ContextVar('read_database', default=None)
+
+
+class ReplicaRouter:
+    """Send catalog reads made inside ``use_replica`` views to READ_REPLICA.
+
+    Only models of the apps in REPLICA_APP_LABELS are routed, so sessions,
+    users and orders are always read from the primary. Writes always go to
+    the primary, and migrations never run against the replica, which is
+    expected to be a copy of the primary kept up to date outside Django.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in REPLICA_APP_LABELS:
+            return _read_database.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', settings.READ_REPLICA}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if settings.READ_REPLICA and db == settings.READ_REPLICA:
+            return False
+        return None
+
+
+def pin_to_primary(request):
+    """Read from the primary for this user until their write has replicated."""
+    if settings.READ_REPLICA:
+        request.session[PRIMARY_PIN_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+
+
+def is_pinned_to_primary(request):
+    pinned_until = request.session.get(PRIMARY_PIN_SESSION_KEY)
+    return pinned_until is not None and pinned_until > time.time()
+
+
+def use_replica(view_func):
+    """Serve the view's catalog reads from the replica, if one is configured.
+
+    Users who wrote within the last REPLICA_STICKY_SECONDS keep reading from
+    the primary so they always see their own rating, review or purchase.
+    """
+
+    if iscoroutinefunction(view_func):
+
+        @functools.wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if not settings.READ_REPLICA or await sync_to_async(is_pinned_to_primary)(request):
+                return await view_func(request, *args, **kwargs)
+            token = _read_database.set(settings.READ_REPLICA)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _read_database.reset(token)
+
+        return async_wrapper
+
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not settings.READ_REPLICA or is_pinned_to_primary(request):
+            return view_func(request, *args, **kwargs)
+        token = _read_database.set(settings.READ_REPLICA)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _read_database.reset(token)
+
+    return wrapper
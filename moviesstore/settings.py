@@ -74,13 +74,96 @@ WSGI_APPLICATION = 'moviesstore.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# DATABASE_PROFILE=production tunes SQLite for concurrent writers: WAL so
+# readers never block the writer, synchronous=NORMAL (safe with WAL), a
+# memory-mapped read path, a busy timeout, transactions that take the write
+# lock on BEGIN, and persistent connections that are health checked on reuse.
+
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "development" if DEBUG else "production")
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'moviesstore.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file-backed test database, so tests that run requests in parallel
+        # threads see SQLite's real locking rather than shared-cache table locks.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.getenv("DATABASE_CONN_MAX_AGE", 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': int(os.getenv("DATABASE_BUSY_TIMEOUT", 20)),
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'mmap_size': 256 * 1024 * 1024,
+            },
+        },
+    })
+
+# Read replica
+# Set DATABASE_REPLICA to the path of a copy of db.sqlite3 (kept in sync by
+# whatever replicates it) to serve catalog and analytics reads from it. A user
+# who rates, reviews, votes or buys reads from the primary for the next
+# REPLICA_STICKY_SECONDS so they always see their own write.
+
+DATABASE_REPLICA = os.getenv("DATABASE_REPLICA")
+
+READ_REPLICA = None
+
+if DATABASE_REPLICA:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': DATABASE_REPLICA,
+        'TEST': {'MIRROR': 'default'},
+    }
+    READ_REPLICA = 'replica'
+
+DATABASE_ROUTERS = ['moviesstore.routers.ReplicaRouter']
+
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 15))
+
+
+
+# Sessions
+# SESSION_MODE picks where session data (mostly the cart) lives:
+#   db         - the django_session table (default)
+#   cookie     - signed cookies; no server-side storage or writes at all
+#   cached_db  - the sessions cache, written through to the database
+#   cache      - the sessions cache only
+# The sessions cache is file based so every worker process on the host shares
+# it; point SESSION_CACHE_LOCATION at /dev/shm to keep it in memory.
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}
+
+SESSION_MODE = os.getenv("SESSION_MODE", "db")
+
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+
+SESSION_CACHE_ALIAS = 'sessions'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("SESSION_CACHE_LOCATION", str(BASE_DIR / '.session_cache')),
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -133,3 +216,79 @@ STATICFILES_DIRS = [
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+
+# Production static/media serving. Outside development, collectstatic writes
+# manifest-hashed copies plus .gz/.br variants, and moviesstore/wsgi.py wraps
+# the app in StaticMediaHandler so static and media requests are answered
+# from disk (with Range and conditional GET) without entering Django. Hashed
+# files are cached for a year; other files for the max-ages below.
+# StaticMediaHandler is WSGI middleware: moviesstore/asgi.py is not wrapped,
+# so an ASGI deployment with DEBUG off must serve /static/ and /media/ from
+# the web server or a CDN in front of it.
+
+SERVE_STATIC_FILES = os.getenv("SERVE_STATIC_FILES", "false" if DEBUG else "true") == "true"
+STATIC_MAX_AGE = 60 * 60
+MEDIA_MAX_AGE = 60 * 60 * 24
+
+if not DEBUG:
+    STORAGES = {
+        'default': {
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        },
+        'staticfiles': {
+            'BACKEND': 'moviesstore.storage.CompressedManifestStaticFilesStorage',
+        },
+    }
+
+# The test runner swaps the manifest storage above for plain storage, since
+# the suite runs without collectstatic.
+TEST_RUNNER = 'moviesstore.test_runner.TestRunner'
+
+# Widths of the resized JPEG/PNG and WebP variants generated for every
+# Movie.image (see movies/images.py) and offered to browsers through srcset.
+MOVIE_THUMBNAIL_WIDTHS = (160, 320, 640)
+MOVIE_THUMBNAIL_QUALITY = 80
+
+# Keyset pagination: default page sizes and the largest page a client may
+# request with ?per_page=.
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "24"))
+ORDERS_PAGE_SIZE = 10
+REVIEWS_PAGE_SIZE = 20
+REQUESTS_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Rendered catalog cards and movie detail fragments are cached under keys
+# that include Movie.cache_version, so they never go stale; the timeout only
+# bounds how long unused fragments occupy the cache.
+MOVIE_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# "Also liked" recommendations: neighbors kept per movie by the offline
+# build_recommendations command, and how many of them the movie page shows.
+RECOMMENDATIONS_TOP_K = 10
+RECOMMENDATIONS_SHOWN = 5
+
+# Catalog search backend; see movies/search.py. LikeSearchBackend works on any
+# database, SQLiteFTSSearchBackend needs SQLite built with FTS5.
+MOVIES_SEARCH_BACKEND = os.getenv("MOVIES_SEARCH_BACKEND", "movies.search.SQLiteFTSSearchBackend")
+
+# Seconds before a process reloads its in-memory autocomplete index even if
+# it has not seen a Movie change itself.
+AUTOCOMPLETE_MAX_AGE = 300
+
+# Per-process cache of movie name/price/image records used to render carts.
+CART_MOVIE_CACHE_SIZE = 1024
+CART_MOVIE_CACHE_TTL = 60
+
+# Number of titles listed per region (and globally) on the popularity map.
+POPULARITY_MAP_TOP_N = int(os.getenv("POPULARITY_MAP_TOP_N", "5"))
+
+# Trending scores decay by half every TRENDING_HALF_LIFE_HOURS; run
+# rebuild_region_sales after changing it so stored scores are recomputed.
+# TRENDING_WINDOW_HOURS is how many hourly buckets the "recent purchases"
+# count next to each trending title covers.
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "72"))
+TRENDING_WINDOW_HOURS = int(os.getenv("TRENDING_WINDOW_HOURS", "168"))
+
+# Rows fetched per database round trip (and written per chunk) by the
+# staff data exports; see moviesstore/exports.py.
+EXPORT_CHUNK_SIZE = 2000
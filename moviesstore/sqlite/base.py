@@ -0,0 +1,34 @@
+from django.db.backends.signals import connection_created
+from django.db.backends.sqlite3 import base
+from django.dispatch import receiver
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite backend that understands two extra OPTIONS.
+
+    ``pragmas`` is a dict of PRAGMA statements run on every new connection
+    (see ``apply_pragmas`` below). ``transaction_mode`` changes the ``BEGIN``
+    that opens each atomic block; with ``IMMEDIATE`` a transaction takes the
+    write lock up front, so a read followed by a write can wait on the busy
+    timeout instead of failing straight away with "database is locked" when
+    another connection wrote in between.
+    """
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        self.transaction_mode = kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
+
+
+@receiver(connection_created, sender=DatabaseWrapper)
+def apply_pragmas(sender, connection, **kwargs):
+    with connection.cursor() as cursor:
+        for name, value in connection.pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,180 @@
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+CHUNK_SIZE = 64 * 1024
+
+
+class StaticMediaHandler:
+    """WSGI middleware that serves STATIC_URL and MEDIA_URL straight from disk.
+
+    Requests under either prefix never reach Django's URL resolver or
+    middleware. Responses carry ETag/Last-Modified and answer conditional
+    GETs with 304, single byte ranges are answered with 206, and precompressed
+    ``.br``/``.gz`` siblings written by collectstatic are sent to clients that
+    accept them. Manifest-hashed static names are cached for a year as
+    immutable; everything else for STATIC_MAX_AGE/MEDIA_MAX_AGE seconds.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.mounts = [
+            (settings.STATIC_URL, str(settings.STATIC_ROOT), settings.STATIC_MAX_AGE),
+            (settings.MEDIA_URL, str(settings.MEDIA_ROOT), settings.MEDIA_MAX_AGE),
+        ]
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        for prefix, root, max_age in self.mounts:
+            if prefix and path.startswith(prefix):
+                return self.serve(environ, start_response, root, path[len(prefix):], max_age)
+        return self.application(environ, start_response)
+
+    def serve(self, environ, start_response, root, name, max_age):
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            return self.respond(start_response, '405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+        try:
+            path = safe_join(root, name)
+        except (SuspiciousFileOperation, ValueError):
+            return self.respond(start_response, '404 Not Found')
+        original = self.stat(path)
+        if original is None:
+            return self.respond(start_response, '404 Not Found')
+
+        vary = self.has_variants(path)
+        encoding, path, file_stat = self.negotiate_encoding(environ, path, original)
+        etag = quote_etag(f'{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}' + (f'-{encoding}' if encoding else ''))
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if HASHED_NAME_RE.search(name):
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            cache_control = f'public, max-age={max_age}'
+        headers = [
+            ('ETag', etag),
+            ('Last-Modified', http_date(original.st_mtime)),
+            ('Cache-Control', cache_control),
+            ('Accept-Ranges', 'bytes'),
+        ]
+        if vary:
+            headers.append(('Vary', 'Accept-Encoding'))
+
+        if self.not_modified(environ, etag, original.st_mtime):
+            return self.respond(start_response, '304 Not Modified', headers)
+
+        size = file_stat.st_size
+        start, end = 0, size - 1
+        status = '200 OK'
+        byte_range = self.requested_range(environ, etag, size)
+        if byte_range == 'unsatisfiable':
+            headers.append(('Content-Range', f'bytes */{size}'))
+            return self.respond(start_response, '416 Range Not Satisfiable', headers)
+        if byte_range is not None:
+            start, end = byte_range
+            status = '206 Partial Content'
+            headers.append(('Content-Range', f'bytes {start}-{end}/{size}'))
+
+        headers.append(('Content-Type', content_type))
+        headers.append(('Content-Length', str(end - start + 1)))
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response(status, headers)
+        if method == 'HEAD':
+            return [b'']
+        file = open(path, 'rb')
+        if start == 0 and end == size - 1 and 'wsgi.file_wrapper' in environ:
+            return environ['wsgi.file_wrapper'](file, CHUNK_SIZE)
+        return self.read_range(file, start, end - start + 1)
+
+    def stat(self, path):
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return None
+        return file_stat if stat.S_ISREG(file_stat.st_mode) else None
+
+    def has_variants(self, path):
+        return any(os.path.exists(path + suffix) for _, suffix in ENCODINGS)
+
+    def negotiate_encoding(self, environ, path, original):
+        accepted = {}
+        for part in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+            coding, _, params = part.strip().partition(';')
+            quality = 1.0
+            match = re.search(r'q=([0-9.]+)', params)
+            if match:
+                try:
+                    quality = float(match.group(1))
+                except ValueError:
+                    quality = 0.0
+            accepted[coding.strip().lower()] = quality
+        for encoding, suffix in ENCODINGS:
+            if accepted.get(encoding, 0) > 0:
+                variant = self.stat(path + suffix)
+                if variant is not None:
+                    return encoding, path + suffix, variant
+        return None, path, original
+
+    def not_modified(self, environ, etag, mtime):
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags
+        if_modified_since = parse_http_date_safe(environ.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and int(mtime) <= if_modified_since
+
+    def requested_range(self, environ, etag, size):
+        """Return ``(start, end)``, ``'unsatisfiable'`` or None for the whole file.
+
+        Only a single range is supported; a multi-range request, or one whose
+        If-Range no longer matches, gets the whole file.
+        """
+        header = environ.get('HTTP_RANGE')
+        if not header:
+            return None
+        if_range = environ.get('HTTP_IF_RANGE')
+        if if_range and if_range != etag:
+            return None
+        match = RANGE_RE.match(header.strip())
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                return 'unsatisfiable'
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            suffix = int(last)
+            if suffix == 0:
+                return 'unsatisfiable'
+            start, end = max(size - suffix, 0), size - 1
+        return start, end
+
+    def read_range(self, file, start, length):
+        with file:
+            file.seek(start)
+            while length > 0:
+                chunk = file.read(min(CHUNK_SIZE, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+
+    def respond(self, start_response, status, headers=()):
+        headers = list(headers)
+        if not status.startswith('304'):
+            headers.append(('Content-Length', '0'))
+        start_response(status, headers)
+        return [b'']
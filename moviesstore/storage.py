@@ -0,0 +1,56 @@
+import gzip
+import os
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest-hashed static files with precompressed ``.gz``/``.br`` siblings.
+
+    After ``collectstatic`` has written the hashed copies, every text asset
+    gets a gzip and a brotli variant, which StaticMediaHandler serves to
+    clients that accept them. Variants that are not meaningfully smaller than
+    the original are not kept.
+    """
+
+    compressible_extensions = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html', '.ico')
+    minimum_saving = 0.05
+
+    def hashed_name(self, name, content=None, filename=None):
+        # The vendored Leaflet files reference images and a source map that
+        # are not shipped; leave such references as they are instead of
+        # failing the whole collectstatic.
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            if content is None and not self.exists(self.clean_name(name)):
+                return name
+            raise
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for hashed_name in sorted(hashed_names):
+            if hashed_name.endswith(self.compressible_extensions):
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as original:
+            content = original.read()
+        variants = {
+            '.gz': gzip.compress(content, compresslevel=9, mtime=0),
+            '.br': brotli.compress(content, quality=11),
+        }
+        for suffix, compressed in variants.items():
+            if len(compressed) <= len(content) * (1 - self.minimum_saving):
+                with open(path + suffix, 'wb') as variant:
+                    variant.write(compressed)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
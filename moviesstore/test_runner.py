@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the suite with plain static file storage.
+
+    Outside DEBUG the staticfiles backend is the strict manifest storage,
+    which refuses to render ``{% static %}`` for files collectstatic has not
+    processed. Tests never run collectstatic, so they swap in the default
+    storage; tests of the manifest storage instantiate it directly.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._static_storage = override_settings(
+            STORAGES={
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            }
+        )
+        self._static_storage.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._static_storage.disable()
+        super().teardown_test_environment(**kwargs)
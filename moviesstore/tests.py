@@ -0,0 +1,262 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+import brotli
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, router
+from django.http import HttpResponse
+from django.urls import reverse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from cart.models import Item, Order
+from movies.models import Movie, Region, Review
+from .routers import pin_to_primary, use_replica
+from .sqlite.base import DatabaseWrapper
+from .static_handler import StaticMediaHandler
+from .storage import CompressedManifestStaticFilesStorage
+
+
+class ProductionSQLiteProfileTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = dict(connection.settings_dict)
+        settings_dict.update({
+            'NAME': str(Path(directory.name) / 'profile.sqlite3'),
+            'OPTIONS': {
+                'timeout': 20,
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'mmap_size': 1024 * 1024},
+            },
+        })
+        self.wrapper = DatabaseWrapper(settings_dict, alias='profile')
+        self.addCleanup(self.wrapper.close)
+
+    def pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('mmap_size'), 1024 * 1024)
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+
+    def test_transactions_begin_immediate(self):
+        self.wrapper.ensure_connection()
+        with CaptureQueriesContext(self.wrapper) as queries:
+            self.wrapper._start_transaction_under_autocommit()
+        self.wrapper.rollback()
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+@use_replica
+def routed_databases(request):
+    request.routed = (router.db_for_read(Movie), router.db_for_read(User), router.db_for_write(Movie))
+    return HttpResponse()
+
+
+@override_settings(READ_REPLICA='replica', REPLICA_STICKY_SECONDS=15)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.request.session = {}
+
+    def test_catalog_reads_in_replica_views_use_the_replica(self):
+        routed_databases(self.request)
+        self.assertEqual(self.request.routed, ('replica', 'default', 'default'))
+        self.assertEqual(router.db_for_read(Movie), 'default')
+
+    def test_user_is_pinned_to_primary_after_a_write(self):
+        pin_to_primary(self.request)
+        routed_databases(self.request)
+        self.assertEqual(self.request.routed, ('default', 'default', 'default'))
+
+    def test_pin_expires(self):
+        pin_to_primary(self.request)
+        with self.settings(REPLICA_STICKY_SECONDS=-1):
+            pin_to_primary(self.request)
+        routed_databases(self.request)
+        self.assertEqual(self.request.routed[0], 'replica')
+
+    @override_settings(READ_REPLICA=None)
+    def test_everything_reads_from_primary_without_a_replica(self):
+        pin_to_primary(self.request)
+        routed_databases(self.request)
+        self.assertEqual(self.request.routed[0], 'default')
+        self.assertEqual(self.request.session, {})
+
+
+class StaticMediaHandlerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.static_root = Path(directory.name) / 'static'
+        self.media_root = Path(directory.name) / 'media'
+        (self.static_root / 'css').mkdir(parents=True)
+        self.media_root.mkdir()
+        self.css = b'body { color: black; }\n' * 100
+        (self.static_root / 'css' / 'site.0123456789ab.css').write_bytes(self.css)
+        (self.static_root / 'css' / 'site.0123456789ab.css.br').write_bytes(brotli.compress(self.css))
+        (self.media_root / 'poster.jpg').write_bytes(bytes(range(256)) * 4)
+        override = self.settings(STATIC_ROOT=str(self.static_root), MEDIA_ROOT=str(self.media_root))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.handler = StaticMediaHandler(self.application)
+
+    def application(self, environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'django']
+
+    def get(self, path, **headers):
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': headers.pop('method', 'GET')}
+        environ.update({f'HTTP_{name.upper()}': value for name, value in headers.items()})
+        setup_testing_defaults(environ)
+        environ.pop('wsgi.file_wrapper', None)
+        result = {}
+
+        def start_response(status, response_headers):
+            result['status'] = int(status.split()[0])
+            result['headers'] = dict(response_headers)
+
+        result['body'] = b''.join(self.handler(environ, start_response))
+        return result
+
+    def test_hashed_static_file_is_immutable_and_precompressed(self):
+        response = self.get('/static/css/site.0123456789ab.css', accept_encoding='gzip, br')
+        self.assertEqual(response['status'], 200)
+        self.assertEqual(response['headers']['Content-Encoding'], 'br')
+        self.assertEqual(response['headers']['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['headers']['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['headers']['Cache-Control'])
+        self.assertEqual(brotli.decompress(response['body']), self.css)
+
+        response = self.get('/static/css/site.0123456789ab.css')
+        self.assertNotIn('Content-Encoding', response['headers'])
+        self.assertEqual(response['body'], self.css)
+
+    def test_conditional_get(self):
+        first = self.get('/media/poster.jpg')
+        self.assertEqual(first['headers']['Cache-Control'], 'public, max-age=86400')
+        response = self.get('/media/poster.jpg', if_none_match=first['headers']['ETag'])
+        self.assertEqual((response['status'], response['body']), (304, b''))
+        response = self.get('/media/poster.jpg', if_modified_since=first['headers']['Last-Modified'])
+        self.assertEqual(response['status'], 304)
+
+    def test_byte_ranges(self):
+        content = (self.media_root / 'poster.jpg').read_bytes()
+        response = self.get('/media/poster.jpg', range='bytes=10-19')
+        self.assertEqual(response['status'], 206)
+        self.assertEqual(response['headers']['Content-Range'], f'bytes 10-19/{len(content)}')
+        self.assertEqual(response['body'], content[10:20])
+        self.assertEqual(self.get('/media/poster.jpg', range='bytes=-5')['body'], content[-5:])
+        self.assertEqual(self.get('/media/poster.jpg', range='bytes=5000-')['status'], 416)
+        self.assertEqual(self.get('/media/poster.jpg', range='bytes=0-1', if_range='"stale"')['status'], 200)
+
+    def test_other_paths_reach_django_and_traversal_is_refused(self):
+        self.assertEqual(self.get('/movies/')['body'], b'django')
+        self.assertEqual(self.get('/media/../static/css/site.0123456789ab.css')['status'], 404)
+        self.assertEqual(self.get('/media/missing.jpg')['status'], 404)
+        self.assertEqual(self.get('/media/poster.jpg', method='POST')['status'], 405)
+
+
+class CompressedManifestStorageTests(SimpleTestCase):
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        with tempfile.TemporaryDirectory() as static_root:
+            storages = {
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'moviesstore.storage.CompressedManifestStaticFilesStorage'},
+            }
+            with self.settings(STATIC_ROOT=static_root, STORAGES=storages):
+                call_command('collectstatic', interactive=False, verbosity=0)
+            css_dir = Path(static_root) / 'css'
+            hashed = [name for name in os.listdir(css_dir) if name.startswith('style.') and name.endswith('.css')]
+            self.assertEqual(len(hashed), 2)
+            hashed_name = next(name for name in hashed if name != 'style.css')
+            original = (css_dir / hashed_name).read_bytes()
+            self.assertEqual(gzip.decompress((css_dir / f'{hashed_name}.gz').read_bytes()), original)
+            self.assertEqual(brotli.decompress((css_dir / f'{hashed_name}.br').read_bytes()), original)
+
+
+    def test_files_missing_from_the_manifest_raise(self):
+        with tempfile.TemporaryDirectory() as static_root:
+            storage = CompressedManifestStaticFilesStorage(location=static_root, base_url='/static/')
+            with self.assertRaises(ValueError):
+                storage.url('css/style.css')
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='analyst', password='password', is_staff=True)
+        cls.buyer = User.objects.create_user(username='buyer', password='password')
+        cls.movie = Movie.objects.create(name='Movie, The', price=10, description='', image='movie_images/test.jpg')
+        cls.region = Region.objects.first()
+        cls.orders = []
+        for day in (1, 15, 31):
+            order = Order.objects.create(user=cls.buyer, total=20, region=cls.region)
+            date = datetime.datetime(2024, 5, day, 12, tzinfo=datetime.timezone.utc)
+            Order.objects.filter(pk=order.pk).update(date=date)
+            Item.objects.create(order=order, movie=cls.movie, price=10, quantity=2)
+            cls.orders.append(order)
+        Review.objects.create(movie=cls.movie, user=cls.buyer, comment='Line one\n"quoted"')
+
+    def export(self, *args):
+        out = io.StringIO()
+        call_command('export_data', *args, stdout=out)
+        return out.getvalue()
+
+    def test_command_streams_csv_within_date_range(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('items', '--start', '2024-05-15', '--end', '2024-05-31'))))
+        self.assertEqual([int(row['order_id']) for row in rows], [self.orders[1].id, self.orders[2].id])
+        self.assertEqual(rows[0]['movie'], 'Movie, The')
+        self.assertEqual(rows[0]['region'], self.region.code)
+        self.assertEqual(rows[0]['date'], '2024-05-15T12:00:00+00:00')
+
+    def test_command_writes_json_lines_in_small_chunks(self):
+        lines = self.export('reviews', '--format', 'jsonl', '--chunk-size', '1').splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['comment'], 'Line one\n"quoted"')
+        orders = [json.loads(line) for line in self.export('orders', '--format', 'jsonl', '--chunk-size', '2').splitlines()]
+        self.assertEqual([order['id'] for order in orders], [order.id for order in self.orders])
+        self.assertEqual(orders[0]['username'], 'buyer')
+
+    def test_csv_and_json_lines_write_the_same_timestamps(self):
+        moment = datetime.datetime(2024, 5, 15, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+        Order.objects.filter(pk=self.orders[1].pk).update(date=moment)
+        csv_rows = list(csv.DictReader(io.StringIO(self.export('orders'))))
+        json_rows = [json.loads(line) for line in self.export('orders', '--format', 'jsonl').splitlines()]
+        self.assertEqual([row['date'] for row in csv_rows], [row['date'] for row in json_rows])
+        self.assertEqual(json_rows[1]['date'], '2024-05-15T12:00:00.123456+00:00')
+
+    def test_endpoint_is_staff_only(self):
+        self.client.force_login(self.buyer)
+        response = self.client.get(reverse('exports.download', args=['orders']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_endpoint_streams_export(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('exports.download', args=['orders']), {'format': 'jsonl', 'end': '2024-05-15'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [self.orders[0].id, self.orders[1].id])
+
+    def test_endpoint_rejects_bad_parameters(self):
+        self.client.force_login(self.staff)
+        url = reverse('exports.download', args=['orders'])
+        self.assertEqual(self.client.get(url, {'start': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('exports.download', args=['users'])).status_code, 404)